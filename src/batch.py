@@ -0,0 +1,292 @@
+import click
+import glob
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import SimpleQueue, cpu_count
+from pathlib import Path
+
+from src.cli import (
+    VIDEO_EXTENSIONS,
+    analyze_video,
+    bold,
+    build_extractors,
+    dim,
+    extractor_options,
+    get_videos_from_folder,
+    write_output,
+)
+from src.utils.cache import ResultCache
+from src.utils.checkpoint import CheckpointStore
+from src.utils.results_store import DB_NAME, ResultsStore
+
+# Results are written to the store in transactions of this many videos.
+STORE_BATCH = 64
+
+_extractors = None
+_results_root = None
+_cache = None
+_parallel = False
+_decoder = "opencv"
+_checkpoints = None
+_json_output = True
+_shared_stems = frozenset()
+_started = None
+
+
+def read_manifest(manifest_path):
+    manifest = Path(manifest_path)
+    videos = []
+    for line in manifest.read_text().splitlines():
+        entry = line.strip()
+        if not entry or entry.startswith("#"):
+            continue
+        video = Path(entry)
+        if not video.is_absolute():
+            video = manifest.parent / video
+        videos.append(video)
+    return videos
+
+
+def collect_videos(inputs):
+    videos = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            videos.extend(get_videos_from_folder(path))
+        elif path.is_file() and path.suffix.lower() in VIDEO_EXTENSIONS:
+            videos.append(path)
+        elif path.is_file():
+            videos.extend(read_manifest(path))
+        else:
+            videos.extend(
+                Path(match)
+                for match in sorted(glob.glob(item, recursive=True))
+                if Path(match).suffix.lower() in VIDEO_EXTENSIONS
+            )
+
+    seen = set()
+    unique = []
+    for video in videos:
+        key = video.resolve()
+        if key not in seen:
+            seen.add(key)
+            unique.append(video)
+    return unique
+
+
+def _init_worker(
+    options,
+    results_root,
+    cache_dir,
+    parallel,
+    decoder,
+    checkpoints,
+    json_output,
+    verbose,
+    shared_stems,
+    started,
+):
+    global _extractors, _results_root, _cache, _parallel, _decoder, _checkpoints
+    global _json_output, _shared_stems, _started
+    if not verbose:
+        devnull = open(os.devnull, "w")
+        sys.stdout = devnull
+        sys.stderr = devnull
+    _extractors = build_extractors(**options)
+    _results_root = results_root
+    _cache = ResultCache(cache_dir) if cache_dir else None
+    _parallel = parallel
+    _decoder = decoder
+    _checkpoints = checkpoints
+    _json_output = json_output
+    _shared_stems = shared_stems
+    _started = started
+
+
+def _analyze(video_path):
+    # Written straight to the pipe, so it survives the worker crashing next.
+    _started.put(video_path)
+    start_time = time.time()
+    output_data = analyze_video(
+        video_path, _extractors, _cache, _parallel, _decoder, _checkpoints
+    )
+    output_file = write_output(
+        output_data,
+        _results_root,
+        _extractors,
+        _json_output,
+        Path(video_path).stem in _shared_stems,
+    )
+    return output_data, output_file, time.time() - start_time
+
+
+def _run_pool(videos, jobs, initargs, report):
+    """Analyze ``videos`` on a pool of ``jobs`` workers, calling ``report``
+    with each video and its result or exception.
+
+    If a worker dies, the pool breaks and every unfinished video is returned
+    along with the ones that had started, one of which crashed it.
+    """
+    started = SimpleQueue()
+    finished = set()
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=initargs + (started,),
+    ) as executor:
+        futures = {executor.submit(_analyze, str(video)): video for video in videos}
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                continue
+            except Exception as e:
+                result = e
+            finished.add(video)
+            report(video, result)
+
+    unfinished = [video for video in videos if video not in finished]
+    running = set()
+    while not started.empty():
+        running.add(started.get())
+    started.close()
+    return unfinished, [video for video in unfinished if str(video) in running]
+
+
+@click.command()
+@click.argument("inputs", nargs=-1, required=True)
+@click.option(
+    "--jobs",
+    "-j",
+    default=2,
+    help="Number of videos analyzed concurrently",
+)
+@click.option("--results-dir", default="results", help="Root directory for outputs")
+@click.option(
+    "--verbose/--quiet",
+    default=False,
+    help="Show per-extractor progress from worker processes",
+)
+@extractor_options
+def main(
+    inputs,
+    jobs,
+    results_dir,
+    verbose,
+    cache,
+    cache_dir,
+    parallel,
+    checkpoint_interval,
+    db,
+    json_output,
+    decoder,
+    **options,
+):
+    """Analyze every video in INPUTS (folders, glob patterns or manifest files)."""
+    videos = collect_videos(inputs)
+
+    click.echo("")
+    click.echo(bold("VIDEO CORE BATCH ANALYSIS"))
+    click.echo(dim(f"  VIDEOS: {len(videos)}"))
+
+    if not videos:
+        click.echo(bold("NO VIDEOS DETECTED"))
+        click.echo(dim(f"FORMATS: {', '.join(sorted(VIDEO_EXTENSIONS))}"))
+        return
+
+    jobs = max(1, min(jobs, len(videos)))
+    if options["cores"] is None:
+        options["cores"] = max(1, cpu_count() // jobs)
+
+    click.echo(dim(f"  JOBS: {jobs}"))
+    click.echo(dim(f"  CORES PER JOB: {options['cores']}"))
+    click.echo("")
+
+    failures = []
+    start_time = time.time()
+    store = ResultsStore(db or Path(results_dir) / DB_NAME)
+    stored = []
+
+    initargs = (
+        options,
+        results_dir,
+        cache_dir if cache else None,
+        parallel,
+        decoder,
+        CheckpointStore(cache_dir, checkpoint_interval)
+        if checkpoint_interval > 0
+        else None,
+        json_output,
+        verbose,
+        # Videos sharing a stem get a path hash in their results directory
+        frozenset(
+            stem for stem, n in Counter(video.stem for video in videos).items() if n > 1
+        ),
+    )
+    done = 0
+
+    def report(video, result):
+        nonlocal done
+        done += 1
+        prefix = f"  [{done}/{len(videos)}]"
+        if isinstance(result, Exception):
+            failures.append((video, result))
+            click.echo(f"{prefix} {bold('FAILED')} {video}: {result}")
+            return
+        output_data, output_file, elapsed = result
+        click.echo(f"{prefix} {video} -> {output_file or store.path} ({elapsed:.1f}s)")
+        stored.append(output_data)
+        if len(stored) >= STORE_BATCH:
+            store.add_many(stored)
+            stored.clear()
+
+    try:
+        # A crashed worker (segfault, OOM kill) breaks the whole pool. The
+        # videos it had not started are rescheduled on a fresh pool, and
+        # the ones that were running are retried alone so the crash can be
+        # pinned on a single video.
+        rounds = [(videos, jobs)]
+        while rounds:
+            batch, workers = rounds.pop(0)
+            unfinished, running = _run_pool(batch, workers, initargs, report)
+            if not unfinished:
+                continue
+            rest = [video for video in unfinished if video not in running]
+            if running and rest:
+                rounds.append((rest, min(jobs, len(rest))))
+            if len(running) > 1:
+                rounds.extend(([video], 1) for video in running)
+            else:
+                # With no video started the workers died on startup, and
+                # nothing would ever finish.
+                for video in running or unfinished:
+                    report(video, BrokenProcessPool("worker process died"))
+    except KeyboardInterrupt:
+        click.echo("")
+        click.echo(bold("INTERRUPT"))
+        click.echo("SYSTEM HALT")
+        sys.exit(0)
+    finally:
+        store.add_many(stored)
+        store.close()
+
+    click.echo("")
+    click.echo(bold("COMPLETE"))
+    click.echo(f"  SUCCEEDED: {len(videos) - len(failures)}/{len(videos)}")
+    click.echo(f"  TIME TAKEN: {time.time() - start_time:.2f}s")
+    click.echo(f"  STORE: {store.path}")
+    for video, error in failures:
+        click.echo(dim(f"  FAILED: {video} ({error})"))
+    click.echo("")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,22 @@
 import click
+import hashlib
 import json
 import sys
-import questionary
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from src.extractors.shot_cut_detector import ShotCutDetector
-from src.extractors.motion_analyzer import MotionAnalyzer
-from src.extractors.text_analyzer import TextAnalyzer
-from src.extractors.object_dominance import ObjectDominanceAnalyzer
+from src.extractors.keywords import STOP_WORDS
+from src.extractors.motion_estimators import ESTIMATORS
+from src.extractors.ocr_backends import OCR_BACKENDS
+from src.extractors.yolo_runtime import RUNTIMES
+from src.utils.cache import ResultCache, fingerprint_video
+from src.utils.checkpoint import CHECKPOINT_INTERVAL, CheckpointStore
+from src.utils.frame_source import DECODERS, open_source
+from src.utils.results_store import DB_NAME, ResultsStore
+from src.utils.resources import allocate_cores, set_opencv_threads
 
 VIDEO_EXTENSIONS = {".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv", ".webm"}
+FEATURES = ("shot_cuts", "motion", "text", "object_dominance")
 
 
 def bold(text):
@@ -41,6 +48,8 @@ def get_videos_from_folder(folder_path):
 
 
 def select_video_interactive():
+    import questionary
+
     videos_folder = Path("videos")
     videos = get_videos_from_folder(videos_folder)
 
@@ -81,32 +90,435 @@ def select_video_interactive():
     return None
 
 
-@click.command()
-@click.argument("video_path", type=click.Path(exists=True), required=False)
-@click.option("--threshold", default=27.0, help="Scene detection sensitivity threshold")
-@click.option("--min-scene-len", default=15, help="Minimum scene length in frames")
-@click.option("--gpu/--no-gpu", default=True, help="Enable/disable GPU acceleration")
-@click.option(
-    "--motion-sample-rate", default=5, help="Motion analysis frame sample rate"
-)
-@click.option("--motion-downscale", default=2, help="Motion analysis downscale factor")
-@click.option("--text-sample-rate", default=2, help="Text analysis frame sample rate")
-@click.option(
-    "--text-downscale-width", default=640, help="Text analysis downscale width"
-)
-@click.option("--obj-sample-rate", default=5, help="Object analysis frame sample rate")
-@click.option("--obj-conf", default=0.5, help="Object analysis confidence threshold")
-def main(
-    video_path,
+def parse_features(ctx, param, value):
+    features = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = sorted(set(features) - set(FEATURES))
+    if unknown or not features:
+        raise click.BadParameter(
+            f"expected a comma-separated subset of {', '.join(FEATURES)}"
+        )
+    return tuple(name for name in FEATURES if name in features)
+
+
+EXTRACTOR_OPTIONS = [
+    click.option(
+        "--features",
+        default=",".join(FEATURES),
+        callback=parse_features,
+        help="Comma-separated extractors to run",
+    ),
+    click.option(
+        "--threshold", default=27.0, help="Scene detection sensitivity threshold"
+    ),
+    click.option("--min-scene-len", default=15, help="Minimum scene length in frames"),
+    click.option(
+        "--shot-downscale",
+        default=None,
+        type=float,
+        help="Shot detection downscale factor (default: longer side to ~256px)",
+    ),
+    click.option(
+        "--shot-frame-skip",
+        default=0,
+        help="Score every (N+1)th frame and rescan around candidate cuts",
+    ),
+    click.option(
+        "--shot-workers",
+        default=1,
+        help="Processes for chunked shot detection (1 keeps it in the shared decode)",
+    ),
+    click.option(
+        "--motion-sample-rate",
+        default="5",
+        help="Motion analysis sample rate: every Nth frame, or e.g. 2fps",
+    ),
+    click.option(
+        "--motion-downscale", default=2, help="Motion analysis downscale factor"
+    ),
+    click.option(
+        "--motion-estimator",
+        default="farneback",
+        type=click.Choice(sorted(ESTIMATORS)),
+        help="Motion estimator: dense farneback/dis or sparse lk",
+    ),
+    click.option(
+        "--motion-timeline/--no-motion-timeline",
+        default=False,
+        help="Write per-pair and per-shot motion to motion.npz",
+    ),
+    click.option(
+        "--motion-workers",
+        default=1,
+        help="Processes for chunked motion analysis (1 keeps it in the shared decode)",
+    ),
+    click.option(
+        "--text-sample-rate",
+        default="2",
+        help="Text analysis sample rate: every Nth frame, or e.g. 2fps",
+    ),
+    click.option(
+        "--text-downscale-width", default=640, help="Text analysis downscale width"
+    ),
+    click.option(
+        "--text-change-threshold",
+        default=0.02,
+        help="Reuse the previous OCR result unless a 32px tile changes by more than this fraction",
+    ),
+    click.option(
+        "--text-regions/--no-text-regions",
+        default=False,
+        help="OCR only detected text lines and skip frames without any",
+    ),
+    click.option(
+        "--ocr-backend",
+        default="auto",
+        type=click.Choice(OCR_BACKENDS),
+        help="OCR engine: in-process tesserocr, pytesseract, or auto (tesserocr if installed)",
+    ),
+    click.option(
+        "--text-stop-words/--no-text-stop-words",
+        default=True,
+        help="Drop common English words from the top keywords",
+    ),
+    click.option(
+        "--text-min-df",
+        default=1,
+        help="Minimum number of frames a keyword must appear in",
+    ),
+    click.option(
+        "--keyword-capacity",
+        default=None,
+        type=int,
+        help="Track at most this many distinct keywords (approximate top-k)",
+    ),
+    click.option(
+        "--text-workers",
+        default=None,
+        type=int,
+        help="OCR worker processes (default: share of --cores)",
+    ),
+    click.option(
+        "--obj-sample-rate",
+        default="5",
+        help="Object analysis sample rate: every Nth frame, or e.g. 1fps",
+    ),
+    click.option(
+        "--obj-conf", default=0.5, help="Object analysis confidence threshold"
+    ),
+    click.option(
+        "--obj-batch-size",
+        default="8",
+        help="Frames per YOLO call, or 'auto' to benchmark once per model and host",
+    ),
+    click.option(
+        "--obj-keyframe-interval",
+        default=1,
+        help="Detect on every Nth sample and reuse detections in between (1 = all)",
+    ),
+    click.option(
+        "--obj-propagate-threshold",
+        default=6.0,
+        help="Mean grey-level change from the keyframe that forces a new detection",
+    ),
+    click.option(
+        "--obj-runtime",
+        default="torch",
+        type=click.Choice(RUNTIMES),
+        help="Object detection runtime: PyTorch, or an exported ONNX/OpenVINO model",
+    ),
+    click.option(
+        "--obj-int8/--no-obj-int8",
+        default=False,
+        help="Quantize the exported object detection model to INT8",
+    ),
+    click.option(
+        "--model-service",
+        default=None,
+        help="Socket of a running model service to use instead of loading YOLO",
+    ),
+    click.option(
+        "--cores",
+        default=None,
+        type=int,
+        help="Total CPU cores shared by all extractors (default: all)",
+    ),
+]
+
+
+RUN_OPTIONS = [
+    click.option(
+        "--cache/--no-cache",
+        default=True,
+        help="Reuse per-extractor results for unchanged videos and parameters",
+    ),
+    click.option(
+        "--cache-dir", default="results/.cache", help="Result cache directory"
+    ),
+    click.option(
+        "--parallel/--sequential",
+        default=True,
+        help="Run the extractors concurrently on their share of the cores",
+    ),
+    click.option(
+        "--checkpoint-interval",
+        default=CHECKPOINT_INTERVAL,
+        type=float,
+        help="Seconds between checkpoints that let an interrupted run resume (0 disables)",
+    ),
+    click.option(
+        "--db",
+        default=None,
+        help=f"SQLite results database (default: {DB_NAME} in the results directory)",
+    ),
+    click.option(
+        "--json/--no-json",
+        "json_output",
+        default=True,
+        help="Also write each video's features to output.json",
+    ),
+    click.option(
+        "--decoder",
+        default="opencv",
+        type=click.Choice(DECODERS),
+        help="Decode with OpenCV or an ffmpeg subprocess that also scales and converts frames for each extractor",
+    ),
+]
+
+
+def extractor_options(func):
+    for option in reversed(EXTRACTOR_OPTIONS + RUN_OPTIONS):
+        func = option(func)
+    return func
+
+
+def build_extractors(
+    features,
     threshold,
     min_scene_len,
-    gpu,
+    shot_downscale,
+    shot_frame_skip,
+    shot_workers,
     motion_sample_rate,
     motion_downscale,
+    motion_estimator,
+    motion_timeline,
+    motion_workers,
     text_sample_rate,
     text_downscale_width,
+    text_change_threshold,
+    text_regions,
+    ocr_backend,
+    text_stop_words,
+    text_min_df,
+    keyword_capacity,
+    text_workers,
     obj_sample_rate,
     obj_conf,
+    obj_batch_size,
+    obj_keyframe_interval,
+    obj_propagate_threshold,
+    obj_runtime,
+    obj_int8,
+    model_service,
+    cores,
+):
+    allocation = allocate_cores(cores, features)
+    set_opencv_threads(allocation)
+    extractors = []
+
+    if "shot_cuts" in features:
+        from src.extractors.shot_cut_detector import ShotCutDetector
+
+        extractors.append(
+            ShotCutDetector(
+                threshold=threshold,
+                min_scene_len=min_scene_len,
+                downscale=shot_downscale,
+                frame_skip=shot_frame_skip,
+                workers=shot_workers,
+            )
+        )
+    if "motion" in features:
+        from src.extractors.motion_analyzer import MotionAnalyzer
+
+        extractors.append(
+            MotionAnalyzer(
+                sample_rate=motion_sample_rate,
+                downscale=motion_downscale,
+                workers=motion_workers,
+                estimator=motion_estimator,
+                timeline=motion_timeline,
+            )
+        )
+    if "text" in features:
+        from src.extractors.text_analyzer import TextAnalyzer
+
+        extractors.append(
+            TextAnalyzer(
+                sample_rate=text_sample_rate,
+                downscale_width=text_downscale_width,
+                change_threshold=text_change_threshold,
+                detect_regions=text_regions,
+                ocr_backend=ocr_backend,
+                stop_words=STOP_WORDS if text_stop_words else (),
+                min_document_frequency=text_min_df,
+                keyword_capacity=keyword_capacity,
+                workers=text_workers or allocation["text"],
+            )
+        )
+    if "object_dominance" in features:
+        from src.extractors.object_dominance import ObjectDominanceAnalyzer
+
+        extractors.append(
+            ObjectDominanceAnalyzer(
+                sample_rate=obj_sample_rate,
+                conf_threshold=obj_conf,
+                batch_size=obj_batch_size,
+                keyframe_interval=obj_keyframe_interval,
+                propagate_threshold=obj_propagate_threshold,
+                threads=allocation["object_dominance"],
+                service=model_service,
+                runtime=obj_runtime,
+                int8=obj_int8,
+            )
+        )
+    return extractors
+
+
+def run_extractors(
+    video_path,
+    extractors,
+    parallel=False,
+    decoder="opencv",
+    checkpoints=None,
+    fingerprint=None,
+):
+    shared = [e for e in extractors if not getattr(e, "standalone", False)]
+    standalone = [e for e in extractors if getattr(e, "standalone", False)]
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, len(standalone))) as executor:
+        futures = {}
+        for extractor in standalone:
+            if parallel:
+                futures[extractor] = executor.submit(extractor.extract, str(video_path))
+            else:
+                results[extractor] = extractor.extract(str(video_path))
+
+        if shared:
+            consumers = shared
+            if checkpoints:
+                consumers = [checkpoints.attach(fingerprint, e) for e in shared]
+            source = open_source(video_path, decoder, parallel=parallel)
+            shared_results = source.run(consumers)
+            results.update(zip(shared, shared_results))
+
+        for extractor, future in futures.items():
+            results[extractor] = future.result()
+
+    return [results[extractor] for extractor in extractors]
+
+
+def analyze_video(
+    video_path,
+    extractors,
+    cache=None,
+    parallel=False,
+    decoder="opencv",
+    checkpoints=None,
+):
+    fingerprint = fingerprint_video(video_path) if cache or checkpoints else None
+    features = {}
+    pending = []
+
+    for extractor in extractors:
+        cached = None
+        if cache and hasattr(extractor, "restore"):
+            cached = extractor.restore(cache, fingerprint)
+        elif cache:
+            cached = cache.get(
+                fingerprint, extractor.feature_name, extractor.cache_params()
+            )
+        if cached is None:
+            pending.append(extractor)
+        else:
+            features[extractor.feature_name] = cached
+            click.echo(dim(f"  CACHED: {extractor.feature_name}"))
+
+    if pending:
+        results = run_extractors(
+            video_path, pending, parallel, decoder, checkpoints, fingerprint
+        )
+        for extractor, result in zip(pending, results):
+            features[extractor.feature_name] = result
+            if cache:
+                cache.put(
+                    fingerprint,
+                    extractor.feature_name,
+                    extractor.cache_params(),
+                    result,
+                )
+                if hasattr(extractor, "persist"):
+                    extractor.persist(cache, fingerprint)
+            if checkpoints:
+                checkpoints.clear(fingerprint, extractor)
+
+    return {
+        "video_file": str(video_path),
+        "features": {
+            extractor.feature_name: features[extractor.feature_name]
+            for extractor in extractors
+        },
+    }
+
+
+def results_dir_name(video_path, disambiguate=False):
+    """``<stem>``, or ``<stem>-<path hash>`` for a stem shared by several inputs."""
+    path = Path(video_path).resolve()
+    if not disambiguate:
+        return path.stem
+    return f"{path.stem}-{hashlib.sha1(str(path).encode()).hexdigest()[:8]}"
+
+
+def write_output(
+    output_data,
+    results_root="results",
+    extractors=(),
+    json_output=True,
+    disambiguate=False,
+):
+    results_dir = Path(results_root) / results_dir_name(
+        output_data["video_file"], disambiguate
+    )
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    for extractor in extractors:
+        if hasattr(extractor, "write_artifacts"):
+            extractor.write_artifacts(results_dir, output_data["features"])
+
+    if not json_output:
+        return None
+    output_file = results_dir / "output.json"
+
+    with open(output_file, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+    return output_file
+
+
+@click.command()
+@click.argument("video_path", type=click.Path(exists=True), required=False)
+@extractor_options
+def main(
+    video_path,
+    cache,
+    cache_dir,
+    parallel,
+    checkpoint_interval,
+    db,
+    json_output,
+    decoder,
+    **options,
 ):
     try:
         click.echo("")
@@ -126,64 +538,56 @@ def main(
         click.echo(f"  {selected_video.name}")
         click.echo("")
 
-        detector = ShotCutDetector(
-            threshold=threshold, min_scene_len=min_scene_len, use_gpu=gpu
-        )
-        analyzer = MotionAnalyzer(
-            sample_rate=motion_sample_rate,
-            downscale=motion_downscale,
-        )
-        text_analyzer = TextAnalyzer(
-            sample_rate=text_sample_rate,
-            downscale_width=text_downscale_width,
-        )
-        obj_analyzer = ObjectDominanceAnalyzer(
-            sample_rate=obj_sample_rate, conf_threshold=obj_conf
-        )
+        extractors = build_extractors(**options)
 
         click.echo(bold("PROCESSING"))
         click.echo("")
 
-        shot_result = detector.extract(str(selected_video))
-        motion_result = analyzer.extract(str(selected_video))
-        text_result = text_analyzer.extract(str(selected_video))
-        object_result = obj_analyzer.extract(str(selected_video))
-
-        output_data = {
-            "video_file": str(selected_video),
-            "features": {
-                "shot_cuts": shot_result,
-                "motion": motion_result,
-                "text": text_result,
-                "object_dominance": object_result,
-            },
-        }
-
-        video_name = selected_video.stem
-        results_dir = Path("results") / video_name
-        results_dir.mkdir(parents=True, exist_ok=True)
-
-        output_file = results_dir / "output.json"
+        output_data = analyze_video(
+            selected_video,
+            extractors,
+            ResultCache(cache_dir) if cache else None,
+            parallel=parallel,
+            decoder=decoder,
+            checkpoints=CheckpointStore(cache_dir, checkpoint_interval)
+            if checkpoint_interval > 0
+            else None,
+        )
+        output_file = write_output(
+            output_data, extractors=extractors, json_output=json_output
+        )
+        store = ResultsStore(db or Path("results") / DB_NAME)
+        store.add(output_data)
+        store.close()
 
-        with open(output_file, "w") as f:
-            json.dump(output_data, f, indent=2)
+        features = output_data["features"]
 
         click.echo("")
         click.echo(bold("COMPLETE"))
-        click.echo(f"  CUTS DETECTED: {shot_result['total_cuts']}")
-        click.echo(f"  AVG SCENE: {shot_result['avg_scene_length']}s")
-        click.echo(f"  DURATION: {shot_result['duration']}s")
-        click.echo(
-            f"  MOTION: P90={motion_result['p90_motion']:.2f} ({motion_result['motion_intensity']}) | AVG={motion_result['average_motion']:.2f}"
-        )
-        click.echo(
-            f"  TEXT RATIO: {text_result['text_present_ratio']:.2f} | KEYWORDS: {len(text_result['top_keywords'])}"
-        )
-        click.echo(
-            f"  PERSON/OBJECT RATIO: {object_result['person_object_ratio']:.2f} (P={object_result['total_persons']} O={object_result['total_objects']})"
-        )
+        if "shot_cuts" in features:
+            shot_result = features["shot_cuts"]
+            click.echo(f"  CUTS DETECTED: {shot_result['total_cuts']}")
+            click.echo(f"  AVG SCENE: {shot_result['avg_scene_length']}s")
+            click.echo(f"  DURATION: {shot_result['duration']}s")
+        if "motion" in features:
+            motion_result = features["motion"]
+            click.echo(
+                f"  MOTION: P90={motion_result['p90_motion']:.2f} ({motion_result['motion_intensity']}) | AVG={motion_result['average_motion']:.2f}"
+            )
+        if "text" in features:
+            text_result = features["text"]
+            click.echo(
+                f"  TEXT RATIO: {text_result['text_present_ratio']:.2f} | KEYWORDS: {len(text_result['top_keywords'])}"
+            )
+        if "object_dominance" in features:
+            object_result = features["object_dominance"]
+            click.echo(
+                f"  PERSON/OBJECT RATIO: {object_result['person_object_ratio']:.2f} (P={object_result['total_persons']} O={object_result['total_objects']})"
+            )
         click.echo("")
-        click.echo(dim(f"OUTPUT: {output_file}"))
+        if output_file:
+            click.echo(dim(f"OUTPUT: {output_file}"))
+        click.echo(dim(f"STORE: {store.path}"))
         click.echo("")
 
     except KeyboardInterrupt:
@@ -1,7 +1,13 @@
-from src.extractors.motion_analyzer import MotionAnalyzer
-from src.extractors.shot_cut_detector import ShotCutDetector
-from src.extractors.text_analyzer import TextAnalyzer
-from src.extractors.object_dominance import ObjectDominanceAnalyzer
+import importlib
+
+# Extractors are imported on first access so that importing one of them
+# does not pull in the heavy dependencies (torch, tesseract) of the others.
+_EXTRACTORS = {
+    "MotionAnalyzer": "src.extractors.motion_analyzer",
+    "ShotCutDetector": "src.extractors.shot_cut_detector",
+    "TextAnalyzer": "src.extractors.text_analyzer",
+    "ObjectDominanceAnalyzer": "src.extractors.object_dominance",
+}
 
 __all__ = [
     "MotionAnalyzer",
@@ -9,3 +15,9 @@ __all__ = [
     "TextAnalyzer",
     "ObjectDominanceAnalyzer",
 ]
+
+
+def __getattr__(name):
+    if name in _EXTRACTORS:
+        return getattr(importlib.import_module(_EXTRACTORS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,61 @@
+import fcntl
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32)
+TUNING_FILE = "results/.cache/models/batch_sizes.json"
+
+
+def host_key():
+    return f"{platform.node()}/{platform.machine()}/{os.cpu_count()}"
+
+
+def frames_per_second(run, size, repeats=3):
+    run(size)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run(size)
+    return size * repeats / (time.perf_counter() - start)
+
+
+def fastest_batch_size(run, sizes=BATCH_SIZES, repeats=3, tolerance=0.05):
+    """Smallest batch size within ``tolerance`` of the best measured throughput.
+
+    Sizes are tried in increasing order and the sweep stops as soon as
+    throughput drops, since larger batches only add latency and memory past
+    that point.
+    """
+    rates = {}
+    for size in sizes:
+        rates[size] = frames_per_second(run, size, repeats)
+        if rates[size] < (1 - tolerance) * max(rates.values()):
+            break
+    best = max(rates.values())
+    size = min(size for size, rate in rates.items() if rate >= (1 - tolerance) * best)
+    return size, rates
+
+
+def tuned_batch_size(key, run, path=TUNING_FILE, sizes=BATCH_SIZES):
+    """Batch size for ``key`` on this host, benchmarked with ``run`` on first use."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    key = f"{host_key()}|{key}"
+
+    with open(path.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        tuned = json.loads(path.read_text()) if path.exists() else {}
+        if key not in tuned:
+            size, rates = fastest_batch_size(run, sizes)
+            tuned[key] = {
+                "batch_size": size,
+                "frames_per_second": {
+                    str(size): round(rate, 2) for size, rate in rates.items()
+                },
+            }
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(tuned, indent=2))
+            os.replace(tmp_path, path)
+    return tuned[key]["batch_size"]
@@ -0,0 +1,148 @@
+import cv2
+import numpy as np
+
+# Frames are downscaled until their longer side is about this wide, as
+# scenedetect's SceneManager does by default.
+MIN_WIDTH = 256
+
+
+def downscale_factor(width, height, downscale=None):
+    if downscale is not None:
+        return max(1.0, float(downscale))
+    longest = max(width, height)
+    return 1.0 if longest < MIN_WIDTH else longest / MIN_WIDTH
+
+
+def scaled_size(width, height, downscale):
+    """``(width, height)`` that frames are scored at for ``downscale``."""
+    if downscale <= 1.0:
+        return width, height
+    return max(1, round(width / downscale)), max(1, round(height / downscale))
+
+
+class ContentScorer:
+    """scenedetect's ``ContentDetector`` frame score with the default weights.
+
+    The score is the mean absolute difference of the hue, saturation and
+    value planes between consecutive frames, averaged over the three planes.
+    It is computed on whole HSV images with ``cv2.absdiff`` and
+    ``cv2.sumElems`` into reused buffers and matches scenedetect exactly.
+    Frames are resized to ``size`` unless they already have that size.
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self._hsv = None
+
+    def _buffers(self, shape):
+        if self._hsv is None:
+            if self.size is None:
+                self.size = shape[::-1]
+            shape = tuple(self.size[::-1]) + (3,)
+            self._small = np.empty(shape, dtype=np.uint8)
+            self._hsv = [np.empty(shape, dtype=np.uint8) for _ in range(2)]
+            self._diff = np.empty_like(self._hsv[0])
+            self._current = 0
+            self._primed = False
+
+    def reset(self):
+        self._hsv = None
+
+    @property
+    def last_hsv(self):
+        """HSV of the last scored frame, which the next score compares against."""
+        if self._hsv is None or not self._primed:
+            return None
+        return self._hsv[1 - self._current]
+
+    def prime(self, hsv):
+        """Continue scoring after a frame whose HSV image was ``hsv``."""
+        self._buffers(hsv.shape[:2])
+        self._hsv[1 - self._current][...] = hsv
+        self._primed = True
+
+    def score(self, frame):
+        """Score of ``frame`` against the previous one; 0.0 for the first frame."""
+        self._buffers(frame.shape[:2])
+        if frame.shape[:2] != self._small.shape[:2]:
+            frame = cv2.resize(frame, tuple(self.size), dst=self._small)
+        hsv = self._hsv[self._current]
+        cv2.cvtColor(frame, cv2.COLOR_BGR2HSV, dst=hsv)
+        prev = self._hsv[1 - self._current]
+        self._current = 1 - self._current
+
+        if not self._primed:
+            self._primed = True
+            return 0.0
+        cv2.absdiff(hsv, prev, dst=self._diff)
+        pixels = float(hsv.shape[0] * hsv.shape[1])
+        hue, sat, lum, _ = cv2.sumElems(self._diff)
+        return (hue / pixels + sat / pixels + lum / pixels) / 3.0
+
+
+class FlashFilter:
+    """Port of scenedetect's ``FlashFilter`` that enforces ``min_scene_len``.
+
+    ``merge`` folds cuts closer than ``length`` frames into the last one of
+    the run; ``suppress`` drops them.
+    """
+
+    MODES = ("merge", "suppress")
+
+    def __init__(self, mode="merge", length=15):
+        if mode not in self.MODES:
+            raise ValueError(
+                f"Unknown filter mode {mode!r}, expected one of {self.MODES}"
+            )
+        self.mode = mode
+        self.length = length
+        self._last_above = None
+        self._merge_enabled = False
+        self._merge_triggered = False
+        self._merge_start = None
+
+    def filter(self, frame_num, above_threshold):
+        if not self.length > 0:
+            return [frame_num] if above_threshold else []
+        if self._last_above is None:
+            self._last_above = frame_num
+        if self.mode == "merge":
+            return self._filter_merge(frame_num, above_threshold)
+        return self._filter_suppress(frame_num, above_threshold)
+
+    def _filter_suppress(self, frame_num, above_threshold):
+        if not (above_threshold and frame_num - self._last_above >= self.length):
+            return []
+        self._last_above = frame_num
+        return [frame_num]
+
+    def _filter_merge(self, frame_num, above_threshold):
+        min_length_met = frame_num - self._last_above >= self.length
+        if above_threshold:
+            self._last_above = frame_num
+        if self._merge_triggered:
+            merged = self._last_above - self._merge_start
+            if min_length_met and not above_threshold and merged >= self.length:
+                self._merge_triggered = False
+                return [self._last_above]
+            return []
+        if not above_threshold:
+            return []
+        if min_length_met:
+            self._merge_enabled = True
+            return [frame_num]
+        if self._merge_enabled:
+            self._merge_triggered = True
+            self._merge_start = frame_num
+        return []
+
+
+def filter_cuts(frames, scores, threshold, min_scene_len, mode="merge"):
+    """Cut frames from increasing ``frames`` and their scores, as ``ContentDetector`` reports them."""
+    flash_filter = FlashFilter(mode, min_scene_len)
+    cuts = []
+    for frame_num, above in zip(
+        np.asarray(frames).tolist(), (np.asarray(scores) >= threshold).tolist()
+    ):
+        cuts += flash_filter.filter(frame_num, above)
+    return cuts
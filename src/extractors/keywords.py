@@ -0,0 +1,134 @@
+import heapq
+from itertools import count
+
+STOP_WORDS = frozenset(
+    """
+    about above after again against all also and any are aren because been
+    before being below between both but can cannot could couldn did didn does
+    doesn doing don down during each few for from further had hadn has hasn
+    have haven having her here hers herself him himself his how into isn its
+    itself just let more most mustn myself nor not now off once only other
+    our ours ourselves out over own same shan she should shouldn some such
+    than that the their theirs them themselves then there these they this
+    those through too under until very was wasn were weren what when where
+    which while who whom why will with won would wouldn you your yours
+    yourself yourselves
+    """.split()
+)
+
+
+class KeywordStats:
+    __slots__ = ("count", "error", "frames", "first_frame", "last_frame")
+
+    def __init__(self, frame_idx, error=0):
+        self.count = error
+        self.error = error
+        self.frames = 0
+        self.first_frame = frame_idx
+        self.last_frame = frame_idx
+
+
+class KeywordAggregator:
+    """Running keyword counts, document frequencies and frame spans.
+
+    Frames arrive as ``{word: count}`` partials from the OCR workers and are
+    merged as they complete. With ``capacity`` set, at most that many words
+    are tracked using Space-Saving: a new word evicts the current minimum and
+    inherits its count as an overestimate, so any word occurring more than
+    ``total / capacity`` times is guaranteed to be kept.
+    """
+
+    def __init__(self, stop_words=STOP_WORDS, min_document_frequency=1, capacity=None):
+        self.stop_words = frozenset(stop_words or ())
+        self.min_document_frequency = max(1, int(min_document_frequency))
+        self.capacity = capacity
+        self.words = {}
+        self._heap = []
+        self._sequence = count()
+
+    def _track(self, word, frame_idx):
+        stats = self.words.get(word)
+        if stats is not None:
+            return stats
+        error = 0
+        if self.capacity and len(self.words) >= self.capacity:
+            error = self._evict()
+        stats = self.words[word] = KeywordStats(frame_idx, error)
+        return stats
+
+    def _evict(self):
+        while True:
+            stale_count, _, word = heapq.heappop(self._heap)
+            stats = self.words.get(word)
+            if stats is not None and stats.count == stale_count:
+                del self.words[word]
+                return stats.count
+
+    def _push(self, word, stats):
+        heapq.heappush(self._heap, (stats.count, next(self._sequence), word))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [
+                (stats.count, next(self._sequence), word)
+                for word, stats in self.words.items()
+            ]
+            heapq.heapify(self._heap)
+
+    def add(self, frame_idx, counts):
+        for word, occurrences in counts.items():
+            if word in self.stop_words:
+                continue
+            stats = self._track(word, frame_idx)
+            stats.count += occurrences
+            stats.frames += 1
+            stats.last_frame = frame_idx
+            if self.capacity:
+                self._push(word, stats)
+
+    def state(self):
+        """JSON-serialisable state that ``load_state`` restores exactly."""
+        return {
+            "words": [
+                [
+                    word,
+                    stats.count,
+                    stats.error,
+                    stats.frames,
+                    stats.first_frame,
+                    stats.last_frame,
+                ]
+                for word, stats in self.words.items()
+            ],
+            "heap": [list(entry) for entry in self._heap],
+        }
+
+    def load_state(self, state):
+        self.words = {}
+        for word, count_, error, frames, first_frame, last_frame in state["words"]:
+            stats = self.words[word] = KeywordStats(first_frame, error)
+            stats.count = count_
+            stats.frames = frames
+            stats.last_frame = last_frame
+        # The heap is restored as saved so Space-Saving evicts the same words.
+        self._heap = [tuple(entry) for entry in state["heap"]]
+        self._sequence = count(max((entry[1] for entry in self._heap), default=-1) + 1)
+
+    def top(self, k=10, fps=0.0):
+        ranked = sorted(
+            (
+                (word, stats)
+                for word, stats in self.words.items()
+                if stats.frames >= self.min_document_frequency
+            ),
+            key=lambda item: item[1].count,
+            reverse=True,
+        )
+        return [
+            {
+                "word": word,
+                "count": stats.count,
+                "frames": stats.frames,
+                "first_seen": round(stats.first_frame / fps, 2) if fps > 0 else 0.0,
+                "last_seen": round(stats.last_frame / fps, 2) if fps > 0 else 0.0,
+            }
+            for word, stats in ranked[:k]
+        ]
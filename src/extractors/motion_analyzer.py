@@ -1,9 +1,19 @@
 import cv2
 import numpy as np
 import click
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from tqdm import tqdm
 
+from src.extractors.motion_estimators import create_estimator
+from src.utils.cache import load_arrays, save_arrays
+from src.utils.frame_source import FrameSource
+from src.utils.sampling import chunk_bounds, parse_sample_rate, resolve_stride
 
-def classify_motion(avg_motion):
+
+def classify_motion(avg_motion, scale=1.0):
+    """Bucket a p90 motion value; ``scale`` maps an estimator onto Farneback units."""
+    avg_motion = avg_motion * scale
     if avg_motion < 1.5:
         return "static"
     elif avg_motion < 4:
@@ -16,117 +26,314 @@ def classify_motion(avg_motion):
         return "very_high"
 
 
+PAIR_DTYPE = np.dtype(
+    [("frame", np.int64), ("avg", np.float32), ("p90", np.float32), ("max", np.float32)]
+)
+
+
+class PairStats:
+    """Growable structured array of per-pair motion statistics.
+
+    Storage is allocated on the first append, so an analyzer can be pickled
+    to chunk workers before any pair is recorded without shipping the buffer.
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = max(1, int(capacity))
+        self.size = 0
+        self._data = None
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, size):
+        if self._data is None:
+            self._data = np.zeros(max(size, self.capacity), dtype=PAIR_DTYPE)
+        elif size > len(self._data):
+            grown = np.zeros(max(size, 2 * len(self._data)), dtype=PAIR_DTYPE)
+            grown[: self.size] = self._data[: self.size]
+            self._data = grown
+
+    def append(self, frame_idx, avg, p90, peak):
+        self._reserve(self.size + 1)
+        self._data[self.size] = (frame_idx, avg, p90, peak)
+        self.size += 1
+
+    def extend(self, records):
+        self._reserve(self.size + len(records))
+        self._data[self.size : self.size + len(records)] = records
+        self.size += len(records)
+
+    @property
+    def array(self):
+        if self._data is None:
+            return np.zeros(0, dtype=PAIR_DTYPE)
+        return self._data[: self.size]
+
+
+def summarize_pairs(pairs, calibration=1.0):
+    if len(pairs["frame"]):
+        avg_motion = pairs["avg"].mean(dtype=np.float64)
+        p90_motion = pairs["p90"].mean(dtype=np.float64)
+        max_motion = float(pairs["max"].max())
+    else:
+        avg_motion = 0.0
+        p90_motion = 0.0
+        max_motion = 0.0
+
+    return {
+        "average_motion": round(float(avg_motion), 2),
+        "p90_motion": round(float(p90_motion), 2),
+        "max_motion": round(float(max_motion), 2),
+        "motion_intensity": classify_motion(p90_motion, calibration),
+        "sampled_frames": int(pairs["sampled_frames"]),
+    }
+
+
+def motion_timeline(pairs, cut_timestamps=()):
+    """Per-pair series plus per-shot aggregates for the shots between ``cut_timestamps``.
+
+    A pair crosses a cut when the cut frame lies in ``(frame - stride, frame]``.
+    Such pairs stay in the series, flagged in ``crosses_cut``, but are left out
+    of the shot aggregates since their flow measures the cut, not motion.
+    """
+    frame = pairs["frame"]
+    stride = int(pairs["stride"])
+    fps = float(pairs["fps"])
+    cuts = np.unique(np.rint(np.asarray(cut_timestamps, dtype=np.float64) * fps))
+    cuts = cuts.astype(np.int64)
+
+    shot = np.searchsorted(cuts, frame, side="right")
+    crosses_cut = shot > np.searchsorted(cuts, frame - stride, side="right")
+    keep = ~crosses_cut
+    shot_count = len(cuts) + 1
+
+    last_frame = int(frame[-1]) + 1 if len(frame) else 0
+    shot_start = np.concatenate([[0], cuts])
+    shot_end = np.concatenate([cuts, [max(int(pairs["total_frames"]), last_frame)]])
+    shot_pairs = np.bincount(shot[keep], minlength=shot_count)
+    divisor = np.maximum(shot_pairs, 1)
+    shot_max = np.zeros(shot_count, dtype=np.float32)
+    np.maximum.at(shot_max, shot[keep], pairs["max"][keep])
+
+    return {
+        "frame": frame,
+        "time": frame / fps if fps > 0 else np.zeros(len(frame)),
+        "avg": pairs["avg"],
+        "p90": pairs["p90"],
+        "max": pairs["max"],
+        "crosses_cut": crosses_cut,
+        "shot": shot.astype(np.int32),
+        "shot_start": shot_start,
+        "shot_end": shot_end,
+        "shot_pairs": shot_pairs,
+        "shot_avg": np.bincount(shot[keep], pairs["avg"][keep], shot_count) / divisor,
+        "shot_p90": np.bincount(shot[keep], pairs["p90"][keep], shot_count) / divisor,
+        "shot_max": shot_max,
+        "fps": np.float64(fps),
+        "stride": np.int64(stride),
+    }
+
+
+def _motion_chunk(analyzer, video_path, start_sample, end_sample):
+    """Pairs ending on samples [start_sample, end_sample), seeded with the sample before."""
+    stride = analyzer.stride
+    first_frame = start_sample * stride
+    end_frame = end_sample * stride if end_sample is not None else None
+    source = FrameSource(video_path)
+
+    pair_stats = PairStats()
+    sampled_count = 0
+    prev_gray = None
+    for frame_idx, frame in source.frames(
+        [stride], max(0, first_frame - stride), end_frame
+    ):
+        gray = analyzer._prepare(frame)
+        if prev_gray is not None:
+            pair_stats.append(frame_idx, *analyzer._pair_stats(prev_gray, gray))
+        if frame_idx >= first_frame:
+            sampled_count += 1
+        prev_gray = gray
+
+    return pair_stats.array, sampled_count
+
+
 class MotionAnalyzer:
-    def __init__(self, sample_rate=5, downscale=2):
+    feature_name = "motion"
+
+    def __init__(
+        self,
+        sample_rate=5,
+        downscale=2,
+        workers=1,
+        chunks=None,
+        estimator="farneback",
+        estimator_params=None,
+        calibration=None,
+        timeline=False,
+    ):
         self.sample_rate = sample_rate
         self.downscale = downscale
+        self.workers = max(1, int(workers))
+        self.chunks = chunks
+        self.estimator = create_estimator(estimator, **(estimator_params or {}))
+        self.calibration = (
+            self.estimator.scale if calibration is None else float(calibration)
+        )
+        self.timeline = timeline
+        self.pairs = None
+
+    @property
+    def standalone(self):
+        return self.workers > 1
 
-        self.flow_params = {
-            "pyr_scale": 0.5,
-            "levels": 3,
-            "winsize": 13,
-            "iterations": 3,
-            "poly_n": 5,
-            "poly_sigma": 1.1,
-            "flags": cv2.OPTFLOW_FARNEBACK_GAUSSIAN,
+    def cache_params(self):
+        return {
+            "sample_rate": parse_sample_rate(self.sample_rate),
+            "downscale": self.downscale,
+            "estimator": self.estimator.name,
+            "flow_params": self.estimator.params,
+            "calibration": self.calibration,
         }
 
-    def _process(self, cap, total_frames):
-        motion_magnitudes = []
-        prev_gray = None
-        frame_idx = 0
-        sampled_count = 0
+    def pair_params(self):
+        params = self.cache_params()
+        del params["calibration"]
+        return params
 
-        click.echo("")
+    def restore(self, cache, fingerprint):
+        self.pairs = None
+        path = cache.path(fingerprint, "motion-pairs", self.pair_params(), ".npz")
+        if not path.exists():
+            return None
+        self.pairs = load_arrays(path)
+        return summarize_pairs(self.pairs, self.calibration)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            if frame_idx % self.sample_rate == 0:
-                small = cv2.resize(
-                    frame,
-                    (
-                        frame.shape[1] // self.downscale,
-                        frame.shape[0] // self.downscale,
-                    ),
-                )
-                gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
-
-                if prev_gray is not None:
-                    flow = cv2.calcOpticalFlowFarneback(
-                        prev_gray, gray, None, **self.flow_params
-                    )
-                    mag = np.sqrt(flow[..., 0] ** 2 + flow[..., 1] ** 2)
-                    percentile_90 = np.percentile(mag, 90)
-                    avg_motion = np.mean(mag)
-                    max_motion = np.max(mag)
-                    motion_magnitudes.append(
-                        {"avg": avg_motion, "p90": percentile_90, "max": max_motion}
-                    )
-                    click.echo(
-                        click.style(
-                            f"\r  MOTION [{frame_idx}/{total_frames if total_frames > 0 else '?'}] Avg: {avg_motion:.2f} P90: {percentile_90:.2f}",
-                            dim=True,
-                        ),
-                        nl=False,
-                    )
-
-                prev_gray = gray
-                sampled_count += 1
-
-            frame_idx += 1
+    def persist(self, cache, fingerprint):
+        if self.pairs is not None:
+            path = cache.path(fingerprint, "motion-pairs", self.pair_params(), ".npz")
+            save_arrays(path, self.pairs)
 
-        click.echo("")
-        return motion_magnitudes, sampled_count
+    def write_artifacts(self, results_dir, features=None):
+        if self.timeline and self.pairs is not None:
+            shot_cuts = (features or {}).get("shot_cuts") or {}
+            save_arrays(
+                Path(results_dir) / "motion.npz",
+                motion_timeline(self.pairs, shot_cuts.get("cut_timestamps", [])),
+            )
+
+    def begin(self, info):
+        self.info = info
+        self.stride = resolve_stride(self.sample_rate, info.fps)
+        self.pairs = None
+        self._pairs = PairStats(
+            info.total_frames // self.stride if info.total_frames > 0 else 256
+        )
+        self._prev_gray = None
+        self._sampled_count = 0
 
-    def extract(self, video_path):
         click.echo("")
         click.echo(click.style("MOTION ANALYSIS", bold=True))
+        click.echo(click.style(f"  SAMPLE RATE: 1/{self.stride}", dim=True))
+        click.echo(click.style(f"  DOWNSCALE: {self.downscale}x", dim=True))
+        click.echo(click.style(f"  ESTIMATOR: {self.estimator.name}", dim=True))
+        click.echo(click.style(f"  DURATION: {info.duration:.2f}s", dim=True))
 
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
+    def frame_format(self):
+        return (
+            self.info.width // self.downscale,
+            self.info.height // self.downscale,
+            "gray",
+        )
 
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps if fps > 0 else 0.0
+    def _prepare(self, frame):
+        if frame.ndim == 2:
+            # Already scaled and grey, but the decoder reuses its buffer.
+            return frame.copy()
+        small = cv2.resize(
+            frame,
+            (
+                frame.shape[1] // self.downscale,
+                frame.shape[0] // self.downscale,
+            ),
+        )
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
 
-        click.echo(click.style(f"  SAMPLE RATE: 1/{self.sample_rate}", dim=True))
-        click.echo(click.style(f"  DOWNSCALE: {self.downscale}x", dim=True))
-        click.echo(click.style(f"  DURATION: {duration:.2f}s", dim=True))
+    def _pair_stats(self, prev_gray, gray):
+        return self.estimator.pair_stats(prev_gray, gray)
+
+    def process_frame(self, frame_idx, frame):
+        gray = self._prepare(frame)
 
-        motion_magnitudes, sampled_count = self._process(cap, total_frames)
+        if self._prev_gray is not None:
+            self._pairs.append(frame_idx, *self._pair_stats(self._prev_gray, gray))
 
-        cap.release()
+        self._prev_gray = gray
+        self._sampled_count += 1
 
-        if motion_magnitudes:
-            avg_motion = np.mean([m["avg"] for m in motion_magnitudes])
-            p90_motion = np.mean([m["p90"] for m in motion_magnitudes])
-            max_motion = np.max([m["max"] for m in motion_magnitudes])
-        else:
-            avg_motion = 0.0
-            p90_motion = 0.0
-            max_motion = 0.0
+    def checkpoint_state(self):
+        arrays = {"pairs": self._pairs.array}
+        if self._prev_gray is not None:
+            arrays["prev_gray"] = self._prev_gray
+        return arrays, {"sampled_count": self._sampled_count}
 
-        intensity = classify_motion(p90_motion)
+    def restore_checkpoint(self, arrays, state):
+        self._pairs.extend(arrays["pairs"])
+        self._prev_gray = arrays.get("prev_gray")
+        self._sampled_count = state["sampled_count"]
+
+    def extract_chunked(self, video_path):
+        source = FrameSource(video_path)
+        self.begin(source.info)
+        bounds = chunk_bounds(
+            source.info.total_frames, self.stride, self.chunks or self.workers * 4
+        )
+
+        click.echo(click.style(f"  CHUNKS: {len(bounds)}", dim=True))
+        click.echo(click.style(f"  WORKERS: {self.workers}", dim=True))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(_motion_chunk, self, video_path, start, end)
+                for start, end in bounds
+            ]
+            for future in tqdm(futures, desc="  Motion chunks", leave=False):
+                pair_stats, sampled_count = future.result()
+                self._pairs.extend(pair_stats)
+                self._sampled_count += sampled_count
+
+        return self.finalize()
+
+    def finalize(self):
+        pair_stats = self._pairs.array
+        self.pairs = {
+            "frame": pair_stats["frame"].copy(),
+            "avg": pair_stats["avg"].copy(),
+            "p90": pair_stats["p90"].copy(),
+            "max": pair_stats["max"].copy(),
+            "stride": np.int64(self.stride),
+            "fps": np.float64(self.info.fps),
+            "total_frames": np.int64(self.info.total_frames),
+            "sampled_frames": np.int64(self._sampled_count),
+        }
+        self._pairs = PairStats()
+        self._prev_gray = None
+
+        result = summarize_pairs(self.pairs, self.calibration)
 
         click.echo("")
-        click.echo(click.style("COMPLETE", bold=True))
+        click.echo(click.style("MOTION COMPLETE", bold=True))
         click.echo(
             click.style(
-                f"  AVG: {avg_motion:.2f} | P90: {p90_motion:.2f} ({intensity}) | MAX: {max_motion:.2f}",
+                f"  AVG: {result['average_motion']:.2f} | P90: {result['p90_motion']:.2f} ({result['motion_intensity']}) | MAX: {result['max_motion']:.2f}",
                 dim=True,
             )
         )
-        click.echo(click.style(f"  SAMPLES: {sampled_count}", dim=True))
-        click.echo("")
+        click.echo(click.style(f"  SAMPLES: {result['sampled_frames']}", dim=True))
 
-        return {
-            "average_motion": float(round(avg_motion, 2)),
-            "p90_motion": float(round(p90_motion, 2)),
-            "max_motion": float(round(max_motion, 2)),
-            "motion_intensity": intensity,
-            "sampled_frames": int(sampled_count),
-        }
+        return result
+
+    def extract(self, video_path):
+        if self.workers > 1:
+            return self.extract_chunked(video_path)
+        return FrameSource(video_path).run([self])[0]
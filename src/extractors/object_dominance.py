@@ -1,25 +1,192 @@
 import click
 import cv2
 import numpy as np
-from tqdm import tqdm
-from ultralytics import YOLO
-from typing import List, Tuple
+import queue
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+from src.extractors.batch_tuning import tuned_batch_size
+from src.extractors.yolo_runtime import (
+    EXPORT_DIR,
+    INPUT_SIZE,
+    ExportedDetector,
+    LetterboxBatch,
+    export_model,
+    letterbox_shape,
+)
+from src.model_service import ModelClient
+from src.utils.cache import ResultCache, load_arrays, save_arrays
+from src.utils.frame_source import FrameSource, VideoInfo
+from src.utils.sampling import parse_sample_rate, resolve_stride
+from src.utils.workers import BackgroundWorker
+
+
+def _empty_detections() -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return (
+        np.zeros(0, dtype=np.int16),
+        np.zeros(0, dtype=np.float32),
+        np.zeros((0, 4), dtype=np.float32),
+    )
+
+
+def results_to_detections(
+    results: Iterable,
+) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    detections = []
+    for r in results:
+        boxes = getattr(r, "boxes", None)
+        try:
+            cls = boxes.cls.cpu().numpy()
+            conf = boxes.conf.cpu().numpy()
+            xyxy = boxes.xyxy.cpu().numpy()
+        except Exception:
+            cls, conf, xyxy = _empty_detections()
+        detections.append((cls, conf, xyxy))
+    return detections
+
+
+def save_detections(path: Path, detections: dict) -> None:
+    save_arrays(path, detections)
+
+
+def load_detections(path: Path) -> dict:
+    return load_arrays(path)
+
+
+def summarize_detections(
+    detections: dict,
+    conf_threshold: float,
+    person_classes: Iterable[int] | None = None,
+    exclude_classes: Iterable[int] = (),
+) -> dict:
+    """Recompute the person/object counts for any threshold from saved detections.
+
+    Detections were recorded down to ``record_conf``, so thresholds below it
+    would silently undercount and are rejected.
+    """
+    record_conf = float(detections["record_conf"])
+    if conf_threshold < record_conf:
+        raise ValueError(
+            f"Detections were recorded at conf >= {record_conf}, "
+            f"cannot summarize at {conf_threshold}"
+        )
+    if person_classes is None:
+        person_classes = [int(detections["person_class"])]
+
+    cls = detections["cls"]
+    keep = (detections["conf"] > conf_threshold) & ~np.isin(cls, list(exclude_classes))
+    valid_cls = cls[keep]
+    total_persons = int(np.isin(valid_cls, list(person_classes)).sum())
+    total_objects = int(len(valid_cls) - total_persons)
+    total_sampled = int(detections["sampled_frames"])
+
+    if total_sampled == 0:
+        return {
+            "person_object_ratio": 0.0,
+            "total_persons": 0,
+            "total_objects": 0,
+            "sampled_frames": 0,
+        }
+
+    total = total_persons + total_objects
+    ratio = total_persons / total if total > 0 else 0.0
+
+    return {
+        "person_object_ratio": round(ratio, 2),
+        "total_persons": total_persons,
+        "total_objects": total_objects,
+        "sampled_frames": total_sampled,
+    }
+
+
+def propagated_rows(
+    frame: np.ndarray, targets: np.ndarray, sources: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows to copy from each keyframe in ``sources`` and the target frame of each copy.
+
+    ``frame`` must be sorted, which it is since batches are detected in order.
+    """
+    start = np.searchsorted(frame, sources, "left")
+    counts = np.searchsorted(frame, sources, "right") - start
+    offsets = np.cumsum(counts) - counts
+    index = np.repeat(start - offsets, counts) + np.arange(counts.sum())
+    return index, np.repeat(targets, counts)
+
+
+def parse_batch_size(batch_size: int | str) -> int | str:
+    if str(batch_size).strip().lower() == "auto":
+        return "auto"
+    try:
+        return max(1, int(batch_size))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid batch size: {batch_size}") from None
 
 
 class ObjectDominanceAnalyzer:
+    """Person vs object counts from YOLO detections on sampled frames.
+
+    With ``keyframe_interval`` above 1, detection runs on every Nth sample
+    and on any sample whose thumbnail differs from the last detected one by
+    more than ``propagate_threshold`` (mean absolute grey level), which
+    includes shot changes. Samples in between reuse the keyframe's detections.
+    """
+
+    feature_name = "object_dominance"
+    THUMB_WIDTH = 64
+
     def __init__(
         self,
-        sample_rate: int = 5,
+        sample_rate: int | str = 5,
         conf_threshold: float = 0.5,
-        batch_size: int = 8,
+        batch_size: int | str = 8,
         model_name: str = "yolo12n.pt",
         device: str = "cpu",
+        queue_depth: int = 4,
+        record_conf: float = 0.25,
+        threads: int | None = None,
+        service: str | None = None,
+        runtime: str = "torch",
+        int8: bool = False,
+        export_dir: str = EXPORT_DIR,
+        calibration: str | None = None,
+        keyframe_interval: int = 1,
+        propagate_threshold: float = 6.0,
     ):
-        self.sample_rate = max(1, int(sample_rate))
+        self.sample_rate = sample_rate
         self.conf_threshold = float(conf_threshold)
-        self.batch_size = max(1, int(batch_size))
+        self.batch_size = parse_batch_size(batch_size)
+        self.keyframe_interval = max(1, int(keyframe_interval))
+        self.propagate_threshold = float(propagate_threshold)
         self.model_name = model_name
         self.device = device
+        self.queue_depth = max(1, int(queue_depth))
+        self.record_conf = min(float(record_conf), self.conf_threshold)
+        self.detections = None
+        self._buffers: List[LetterboxBatch] = []
+        self._worker = None
+        self._input = None
+        self.threads = threads
+        self.service = service
+        self.runtime = runtime
+        self.int8 = int8
+        self.calibration = calibration
+        if service:
+            self.model = ModelClient(service)
+            self.weights = self.model.model_name
+        elif runtime != "torch":
+            self._load_exported(export_dir)
+        else:
+            self._load_model()
+        self.person_class = self._find_person_class()
+
+    def _load_model(self) -> None:
+        from ultralytics import YOLO
+
+        if self.threads:
+            import torch
+
+            torch.set_num_threads(int(self.threads))
+        self.weights = self.model_name
         try:
             self.model = YOLO(self.model_name)
         except Exception:
@@ -30,138 +197,355 @@ class ObjectDominanceAnalyzer:
                     dim=True,
                 )
             )
-            self.model = YOLO("yolov8n.pt")
+            self.weights = "yolov8n.pt"
+            self.model = YOLO(self.weights)
+
+    def _load_exported(self, export_dir: str) -> None:
+        try:
+            path = export_model(
+                self.model_name, self.runtime, self.int8, export_dir, self.calibration
+            )
+        except Exception:
+            click.echo(
+                click.style(
+                    f"  WARNING: failed to export {self.model_name}, falling back to yolov8n.pt",
+                    dim=True,
+                )
+            )
+            path = export_model(
+                "yolov8n.pt", self.runtime, self.int8, export_dir, self.calibration
+            )
+        self.model = ExportedDetector(path, self.runtime, threads=self.threads)
+        self.weights = self.model.model_name
+
+    def _tune_batch_size(self) -> int:
+        frame = np.random.default_rng(0).integers(0, 256, (360, 640, 3), np.uint8)
+        batches = {}
+
+        def run(size):
+            if size not in batches:
+                batches[size] = LetterboxBatch(size, canvas=self._canvas(640, 360))
+                for i in range(size):
+                    batches[size].add(i, frame)
+            self.batch_size = size
+            self._detect(batches[size])
+
+        target = self.service or f"{self.device}/threads={self.threads}"
+        return tuned_batch_size(f"{self.weights}|{self.runtime}|{target}", run)
 
-        # Resolve person class index
+    def _find_person_class(self) -> int:
         names = getattr(self.model, "names", None)
-        self.person_class = 0
         if names is not None:
             if isinstance(names, dict):
                 for k, v in names.items():
                     if str(v).lower() == "person":
-                        self.person_class = int(k)
-                        break
+                        return int(k)
             else:
                 for i, v in enumerate(names):
                     if str(v).lower() == "person":
-                        self.person_class = int(i)
-                        break
-
-    def _extract_frames(self, video_path: str) -> List[np.ndarray]:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
-
-        frames: List[np.ndarray] = []
-        frame_idx = 0
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-        pbar = tqdm(total=total_frames, desc="Reading frames", unit="f", leave=False)
-
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            if frame_idx % self.sample_rate == 0:
-                h, w = frame.shape[:2]
-                max_side = max(h, w)
-                if max_side > 640:
-                    scale = 640.0 / max_side
-                    new_h, new_w = int(h * scale), int(w * scale)
-                    resized = cv2.resize(frame, (new_w, new_h))
-                else:
-                    resized = frame
-                frames.append(resized)
-            frame_idx += 1
-            pbar.update(1)
-
-        cap.release()
-        pbar.close()
-        return frames
-
-    def _process_batch(self, batch: List[np.ndarray]) -> Tuple[int, int]:
-        if not batch:
-            return 0, 0
-
-        results = self.model(batch, verbose=False, device=self.device)
-
-        persons = 0
-        objects = 0
-        for r in results:
-            if getattr(r, "boxes", None) is None:
-                continue
-            try:
-                cls = r.boxes.cls.cpu().numpy()
-                conf = r.boxes.conf.cpu().numpy()
-            except Exception:
-                continue
-            if len(conf) == 0:
-                continue
-            mask = conf > self.conf_threshold
-            valid_cls = cls[mask]
-            persons += int((valid_cls == self.person_class).sum())
-            objects += int(len(valid_cls) - int((valid_cls == self.person_class).sum()))
-
-        return persons, objects
+                        return int(i)
+        return 0
+
+    def _canvas(self, width: int, height: int) -> Tuple[int, int]:
+        fixed = getattr(self.model, "input_shape", None)
+        return fixed or letterbox_shape(width, height)
+
+    def _input_buffer(self, batch: LetterboxBatch) -> np.ndarray:
+        shape = (self.batch_size, 3) + batch.canvas
+        if self._input is None or self._input.shape != shape:
+            if self.runtime == "torch" and self.device != "cpu":
+                import torch
+
+                # Page-locked so the host to device copy can run asynchronously
+                self._input = torch.empty(shape, pin_memory=True).numpy()
+            else:
+                self._input = np.empty(shape, dtype=np.float32)
+        return self._input
+
+    def _detect(
+        self, batch: LetterboxBatch
+    ) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        if self.service:
+            return self.model.detect(batch.images[: len(batch)], self.record_conf)
+        tensor = batch.tensor(self._input_buffer(batch))
+        if self.runtime != "torch":
+            return self.model.detect(tensor, self.record_conf)
+
+        import torch
+
+        results = self.model(
+            torch.from_numpy(tensor),
+            verbose=False,
+            device=self.device,
+            conf=self.record_conf,
+        )
+        return results_to_detections(results)
+
+    def _run_batch(self, batch: LetterboxBatch) -> None:
+        try:
+            for i, (cls, conf, xyxy) in enumerate(self._detect(batch)):
+                frame_idx = batch.frame_indices[i]
+                self._frame_ids.append(np.full(len(conf), frame_idx, dtype=np.int32))
+                self._classes.append(cls.astype(np.int16))
+                self._confidences.append(conf.astype(np.float32))
+                self._boxes.append(batch.to_source(i, xyxy))
+        finally:
+            batch.reset()
+            self._free.put(batch)
+
+    def cache_params(self) -> dict:
+        return {
+            "sample_rate": parse_sample_rate(self.sample_rate),
+            "conf_threshold": self.conf_threshold,
+            "model_name": self.weights,
+            "input_size": INPUT_SIZE,
+            "rect": True,
+            "keyframe_interval": self.keyframe_interval,
+            "propagate_threshold": self.propagate_threshold,
+        }
+
+    def detection_params(self) -> dict:
+        params = self.cache_params()
+        del params["conf_threshold"]
+        params["record_conf"] = self.record_conf
+        return params
+
+    def summarize(self, detections: dict) -> dict:
+        return summarize_detections(
+            detections, self.conf_threshold, person_classes=[self.person_class]
+        )
+
+    def restore(self, cache: ResultCache, fingerprint: str) -> dict | None:
+        self.detections = None
+        path = cache.path(fingerprint, "detections", self.detection_params(), ".npz")
+        if not path.exists():
+            return None
+        self.detections = load_detections(path)
+        return self.summarize(self.detections)
+
+    def persist(self, cache: ResultCache, fingerprint: str) -> None:
+        if self.detections is not None:
+            path = cache.path(
+                fingerprint, "detections", self.detection_params(), ".npz"
+            )
+            save_detections(path, self.detections)
+
+    def write_artifacts(self, results_dir: Path, features: dict | None = None) -> None:
+        if self.detections is not None:
+            save_detections(Path(results_dir) / "detections.npz", self.detections)
+
+    def begin(self, info: VideoInfo) -> None:
+        if self._worker is not None:
+            # Left running if the previous video failed part way
+            self._worker.abort()
+        self.info = info
+        self.stride = resolve_stride(self.sample_rate, info.fps)
+        self.detections = None
+        tuned = self.batch_size == "auto"
+        if tuned:
+            self.batch_size = self._tune_batch_size()
+        # One batch being filled, queue_depth waiting and one in inference
+        buffers = self.queue_depth + 2
+        canvas = self._canvas(info.width, info.height)
+        if len(self._buffers) != buffers or self._buffers[0].images.shape[:3] != (
+            (self.batch_size,) + canvas
+        ):
+            self._buffers = [
+                LetterboxBatch(self.batch_size, canvas=canvas) for _ in range(buffers)
+            ]
+        self._free = queue.Queue()
+        for buffer in self._buffers[1:]:
+            buffer.reset()
+            self._free.put(buffer)
+        self._batch = self._buffers[0]
+        self._batch.reset()
+        self._total_sampled = 0
+        self._frame_ids: List[np.ndarray] = []
+        self._classes: List[np.ndarray] = []
+        self._confidences: List[np.ndarray] = []
+        self._boxes: List[np.ndarray] = []
+        self._propagated: List[Tuple[int, int]] = []
+        self._keyframe = None
+        self._keyframe_idx = -1
+        self._since_keyframe = 0
+        self._worker = BackgroundWorker(
+            self._run_batch, maxsize=self.queue_depth, name="yolo"
+        )
 
-    def extract(self, video_path: str) -> dict:
         click.echo("")
         click.echo(click.style("PERSON vs OBJECT DOMINANCE", bold=True))
+        click.echo(click.style(f"  SAMPLE RATE: 1/{self.stride}", dim=True))
+        click.echo(
+            click.style(
+                f"  BATCH SIZE: {self.batch_size}{' (tuned)' if tuned else ''}",
+                dim=True,
+            )
+        )
+        if self.keyframe_interval > 1:
+            click.echo(
+                click.style(
+                    f"  KEYFRAMES: every {self.keyframe_interval} samples, diff > {self.propagate_threshold}",
+                    dim=True,
+                )
+            )
+        click.echo(click.style(f"  QUEUE DEPTH: {self.queue_depth}", dim=True))
+        click.echo(click.style(f"  DEVICE: {self.device}", dim=True))
+        if self.runtime != "torch":
+            click.echo(click.style(f"  RUNTIME: {self.runtime}", dim=True))
+        if self.service:
+            click.echo(click.style(f"  SERVICE: {self.service}", dim=True))
+        elif self.threads:
+            click.echo(click.style(f"  THREADS: {self.threads}", dim=True))
+        click.echo(click.style(f"  MODEL: {self.weights}", dim=True))
+        click.echo(click.style(f"  DURATION: {info.duration:.2f}s", dim=True))
 
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps if fps > 0 else 0.0
-        cap.release()
+    def _submit_batch(self) -> None:
+        self._worker.submit(self._batch)
+        self._batch = self._free.get()
 
-        click.echo(click.style(f"  SAMPLE RATE: 1/{self.sample_rate}", dim=True))
-        click.echo(click.style(f"  BATCH SIZE: {self.batch_size}", dim=True))
-        click.echo(click.style(f"  DEVICE: {self.device}", dim=True))
-        click.echo(click.style(f"  MODEL: {self.model_name}", dim=True))
-        click.echo(click.style(f"  DURATION: {duration:.2f}s", dim=True))
+    def _propagate(self, frame_idx: int, frame: np.ndarray) -> bool:
+        height, width = frame.shape[:2]
+        size = (self.THUMB_WIDTH, max(1, round(self.THUMB_WIDTH * height / width)))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+        if (
+            self._keyframe is not None
+            and self._since_keyframe < self.keyframe_interval
+            and cv2.norm(thumb, self._keyframe, cv2.NORM_L1) / thumb.size
+            <= self.propagate_threshold
+        ):
+            self._propagated.append((frame_idx, self._keyframe_idx))
+            self._since_keyframe += 1
+            return True
 
-        frames = self._extract_frames(video_path)
-        total_sampled = len(frames)
+        self._keyframe = thumb
+        self._keyframe_idx = frame_idx
+        self._since_keyframe = 1
+        return False
+
+    def frame_format(self) -> Tuple[int, int, str] | None:
+        width, height = self._batch.scaled_size(self.info.width, self.info.height)
+        if width >= self.info.width:
+            return None
+        return width, height, "bgr24"
+
+    def process_frame(self, frame_idx: int, frame: np.ndarray) -> None:
+        self._total_sampled += 1
+        if self.keyframe_interval > 1 and self._propagate(frame_idx, frame):
+            return
+        self._batch.add(frame_idx, frame, (self.info.height, self.info.width))
+        if self._batch.full:
+            self._submit_batch()
+
+    def checkpoint_state(self) -> Tuple[dict, dict]:
+        if len(self._batch):
+            self._submit_batch()
+        self._worker.join()
+        arrays = dict(zip(("frame", "cls", "conf", "boxes"), self._raw_detections()))
+        arrays["propagated"] = np.array(self._propagated, dtype=np.int64).reshape(-1, 2)
+        if self._keyframe is not None:
+            arrays["keyframe"] = self._keyframe
+        return arrays, {
+            "total_sampled": self._total_sampled,
+            "keyframe_idx": self._keyframe_idx,
+            "since_keyframe": self._since_keyframe,
+        }
+
+    def restore_checkpoint(self, arrays: dict, state: dict) -> None:
+        self._frame_ids = [arrays["frame"]]
+        self._classes = [arrays["cls"]]
+        self._confidences = [arrays["conf"]]
+        self._boxes = [arrays["boxes"]]
+        self._propagated = [tuple(pair) for pair in arrays["propagated"].tolist()]
+        self._keyframe = arrays.get("keyframe")
+        self._total_sampled = state["total_sampled"]
+        self._keyframe_idx = state["keyframe_idx"]
+        self._since_keyframe = state["since_keyframe"]
+
+    def _raw_detections(
+        self,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        if not self._frame_ids:
+            return (np.zeros(0, dtype=np.int32),) + _empty_detections()
+        return (
+            np.concatenate(self._frame_ids),
+            np.concatenate(self._classes),
+            np.concatenate(self._confidences),
+            np.concatenate(self._boxes),
+        )
+
+    def _collect_detections(self) -> dict:
+        frame, cls, conf, boxes = self._raw_detections()
+
+        if self._propagated:
+            targets, sources = np.array(self._propagated).T
+            index, copies = propagated_rows(frame, targets, sources)
+            copies = copies.astype(frame.dtype)
+            frame = np.concatenate([frame, copies])
+            cls = np.concatenate([cls, cls[index]])
+            conf = np.concatenate([conf, conf[index]])
+            boxes = np.concatenate([boxes, boxes[index]])
+            order = np.argsort(frame, kind="stable")
+            frame, cls, conf, boxes = (
+                frame[order],
+                cls[order],
+                conf[order],
+                boxes[order],
+            )
+
+        return {
+            "frame": frame,
+            "cls": cls.astype(np.int16),
+            "conf": conf.astype(np.float32),
+            "boxes": boxes.astype(np.float32),
+            "names": np.array(self._class_names()),
+            "person_class": np.int16(self.person_class),
+            "record_conf": np.float32(self.record_conf),
+            "sampled_frames": np.int64(self._total_sampled),
+            "propagated_frames": np.int64(len(self._propagated)),
+        }
+
+    def _class_names(self) -> List[str]:
+        names = getattr(self.model, "names", None) or {}
+        if isinstance(names, dict):
+            return [str(names[k]) for k in sorted(names)]
+        return [str(v) for v in names]
+
+    def finalize(self) -> dict:
+        if len(self._batch):
+            self._submit_batch()
+        self._worker.close()
+
+        self.detections = self._collect_detections()
+        self._frame_ids, self._classes, self._confidences, self._boxes = [], [], [], []
+
+        total_sampled = self._total_sampled
+        click.echo("")
         click.echo(click.style(f"  SAMPLED FRAMES: {total_sampled}", dim=True))
+        if self.keyframe_interval > 1:
+            propagated = int(self.detections["propagated_frames"])
+            click.echo(
+                click.style(
+                    f"  DETECTED: {total_sampled - propagated} | PROPAGATED: {propagated}",
+                    dim=True,
+                )
+            )
 
+        result = self.summarize(self.detections)
         if total_sampled == 0:
-            return {
-                "person_object_ratio": 0.0,
-                "total_persons": 0,
-                "total_objects": 0,
-                "sampled_frames": 0,
-            }
-
-        total_persons = 0
-        total_objects = 0
-
-        with tqdm(total=total_sampled, desc="YOLO", unit="f") as pbar:
-            for i in range(0, total_sampled, self.batch_size):
-                batch = frames[i : i + self.batch_size]
-                p, o = self._process_batch(batch)
-                total_persons += p
-                total_objects += o
-                pbar.set_postfix({"P": total_persons, "O": total_objects})
-                pbar.update(len(batch))
-
-        total = total_persons + total_objects
-        ratio = total_persons / total if total > 0 else 0.0
-
-        result = {
-            "person_object_ratio": round(ratio, 2),
-            "total_persons": int(total_persons),
-            "total_objects": int(total_objects),
-            "sampled_frames": int(total_sampled),
-        }
+            return result
 
-        click.echo(click.style("\nCOMPLETE", bold=True))
+        click.echo(click.style("\nOBJECT DOMINANCE COMPLETE", bold=True))
         click.echo(
             click.style(
                 f"  Ratio: {result['person_object_ratio']:.2f} ({result['total_persons']} persons / {result['total_objects']} objects)",
                 dim=True,
             )
         )
-        click.echo(click.style(f"  Samples: {total_sampled}\n", dim=True))
+        click.echo(click.style(f"  Samples: {total_sampled}", dim=True))
 
         return result
+
+    def extract(self, video_path: str) -> dict:
+        return FrameSource(video_path).run([self])[0]
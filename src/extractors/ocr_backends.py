@@ -0,0 +1,138 @@
+import importlib.util
+import shlex
+
+import click
+
+OCR_BACKENDS = ("auto", "pytesseract", "tesserocr")
+
+
+def parse_tesseract_config(config):
+    """Split a tesseract CLI config into ``(psm, oem, variables)``."""
+    psm, oem, variables = None, None, {}
+    args = shlex.split(config or "")
+    for flag, value in zip(args, args[1:]):
+        if flag == "--psm":
+            psm = int(value)
+        elif flag == "--oem":
+            oem = int(value)
+        elif flag == "--dpi":
+            variables["user_defined_dpi"] = value
+        elif flag == "-c" and "=" in value:
+            name, _, setting = value.partition("=")
+            variables[name] = setting
+    return psm, oem, variables
+
+
+class PytesseractBackend:
+    """Runs the ``tesseract`` binary once per image through pytesseract."""
+
+    name = "pytesseract"
+
+    def __init__(self, lang, tesseract_config):
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        self.lang = lang
+        self.tesseract_config = tesseract_config
+
+    def image_to_data(self, image):
+        return self._pytesseract.image_to_data(
+            image,
+            lang=self.lang,
+            config=self.tesseract_config,
+            output_type=self._pytesseract.Output.DICT,
+        )
+
+    def close(self):
+        pass
+
+
+class TesserocrBackend:
+    """Keeps one ``PyTessBaseAPI`` loaded and feeds it raw grayscale buffers.
+
+    Returns the ``text``/``conf`` columns of ``image_to_data`` so keyword
+    extraction is shared with the pytesseract backend.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, lang, tesseract_config):
+        import tesserocr
+
+        self._tesserocr = tesserocr
+        psm, oem, variables = parse_tesseract_config(tesseract_config)
+        self._api = tesserocr.PyTessBaseAPI(
+            lang=lang,
+            psm=tesserocr.PSM.AUTO if psm is None else psm,
+            oem=tesserocr.OEM.DEFAULT if oem is None else oem,
+        )
+        for name, value in variables.items():
+            self._api.SetVariable(name, value)
+
+    def image_to_data(self, image):
+        height, width = image.shape[:2]
+        self._api.SetImageBytes(image.tobytes(), width, height, 1, width)
+        self._api.Recognize()
+
+        text, conf = [], []
+        level = self._tesserocr.RIL.WORD
+        iterator = self._api.GetIterator()
+        if iterator is not None:
+            for word in self._tesserocr.iterate_level(iterator, level):
+                text.append(word.GetUTF8Text(level) or "")
+                conf.append(word.Confidence(level))
+        self._api.Clear()
+        return {"text": text, "conf": conf}
+
+    def close(self):
+        self._api.End()
+
+
+def _start_tesserocr(lang, tesseract_config):
+    """Error message if a tesserocr engine cannot be started, else None."""
+    try:
+        TesserocrBackend(lang, tesseract_config).close()
+    except RuntimeError as e:
+        return str(e)
+    return None
+
+
+def resolve_backend(name, lang="eng", tesseract_config=""):
+    """The backend ``name`` stands for, checked to start in this process.
+
+    OCR workers build their backend lazily, but a tesserocr engine that
+    cannot load its traineddata would fail every task, so it is tried once
+    here: ``auto`` falls back to pytesseract and ``tesserocr`` raises.
+    """
+    if name not in OCR_BACKENDS:
+        raise ValueError(
+            f"Unknown OCR backend {name!r}, expected one of {OCR_BACKENDS}"
+        )
+    installed = importlib.util.find_spec("tesserocr") is not None
+    if name == "pytesseract" or (name == "auto" and not installed):
+        return "pytesseract"
+    if not installed:
+        raise ValueError("OCR backend 'tesserocr' requires the tesserocr package")
+
+    error = _start_tesserocr(lang, tesseract_config)
+    if error is None:
+        return "tesserocr"
+    if name == "tesserocr":
+        raise ValueError(f"OCR backend 'tesserocr' failed to start: {error}")
+    click.echo(
+        click.style(
+            f"  WARNING: tesserocr failed to start ({error}), using pytesseract",
+            dim=True,
+        )
+    )
+    return "pytesseract"
+
+
+def create_backend(name, lang, tesseract_config):
+    backends = {
+        PytesseractBackend.name: PytesseractBackend,
+        TesserocrBackend.name: TesserocrBackend,
+    }
+    if name == "auto":
+        name = resolve_backend(name, lang, tesseract_config)
+    return backends[name](lang, tesseract_config)
@@ -0,0 +1,160 @@
+import re
+import weakref
+from collections import Counter, deque
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from src.extractors.ocr_backends import create_backend
+
+_worker_min_confidence = None
+_worker_backend_args = None
+_worker_backend = None
+_worker_shm = None
+
+
+def extract_keywords(data, min_confidence):
+    high_conf_words = []
+    for i, word in enumerate(data["text"]):
+        word_clean = word.strip()
+        if word_clean and len(word_clean) > 2:
+            conf = data["conf"][i]
+            if conf >= min_confidence:
+                word_lower = re.sub(r"[^\w]", "", word_clean.lower())
+                if word_lower:
+                    high_conf_words.append(word_lower)
+    return high_conf_words
+
+
+def _init_worker(backend, lang, tesseract_config, min_confidence):
+    global _worker_min_confidence, _worker_backend_args
+    _worker_min_confidence = min_confidence
+    _worker_backend_args = (backend, lang, tesseract_config)
+
+
+def _backend():
+    # Built on the first task rather than in the initializer: an initializer
+    # that raises makes multiprocessing respawn the worker forever, while a
+    # task that raises reaches the caller through its result.
+    global _worker_backend
+    if _worker_backend is None:
+        _worker_backend = create_backend(*_worker_backend_args)
+    return _worker_backend
+
+
+def _attach(shm_name):
+    global _worker_shm
+    if _worker_shm is None or _worker_shm.name != shm_name:
+        if _worker_shm is not None:
+            _worker_shm.close()
+        _worker_shm = SharedMemory(name=shm_name, track=False)
+    return _worker_shm
+
+
+def _ocr_slot(shm_name, offset, shape):
+    shm = _attach(shm_name)
+    image = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+
+    ocr_data = _backend().image_to_data(image)
+
+    keywords = []
+    if ocr_data and ocr_data["text"]:
+        keywords = extract_keywords(ocr_data, _worker_min_confidence)
+    return bool(keywords), dict(Counter(keywords))
+
+
+def _shutdown(pool, shm):
+    pool.terminate()
+    if shm is not None:
+        shm.close()
+        shm.unlink()
+
+
+class OcrPool:
+    """Long-lived OCR worker processes fed through a ring of shared-memory slots.
+
+    Callers write preprocessed (binarized, downscaled) frames straight into a
+    free slot, so only the slot offset and shape are pickled per task.
+    Results are returned in submission order.
+    """
+
+    def __init__(
+        self, workers, slots, lang, tesseract_config, min_confidence, backend="auto"
+    ):
+        self.workers = workers
+        self.slots = max(1, int(slots))
+        self._pool = Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=(backend, lang, tesseract_config, min_confidence),
+        )
+        self._shm = None
+        self._slot_bytes = 0
+        self._free = []
+        self._pending = deque()
+        self._finalizer = weakref.finalize(self, _shutdown, self._pool, None)
+
+    def _allocate(self, slot_bytes):
+        self._finalizer.detach()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+        self._shm = SharedMemory(create=True, size=slot_bytes * self.slots)
+        self._slot_bytes = slot_bytes
+        self._free = list(range(self.slots))
+        self._finalizer = weakref.finalize(self, _shutdown, self._pool, self._shm)
+
+    def _collect_oldest(self):
+        tag, slot, result = self._pending.popleft()
+        try:
+            return tag, result.get()
+        finally:
+            self._free.append(slot)
+
+    def submit(self, tag, image):
+        completed = []
+        if image.nbytes > self._slot_bytes:
+            completed.extend(self.drain())
+            self._allocate(image.nbytes)
+
+        while not self._free:
+            completed.append(self._collect_oldest())
+
+        slot = self._free.pop()
+        offset = slot * self._slot_bytes
+        view = np.ndarray(
+            image.shape, dtype=np.uint8, buffer=self._shm.buf, offset=offset
+        )
+        np.copyto(view, image)
+        self._pending.append(
+            (
+                tag,
+                slot,
+                self._pool.apply_async(
+                    _ocr_slot, (self._shm.name, offset, image.shape)
+                ),
+            )
+        )
+        return completed
+
+    def drain(self):
+        completed = []
+        while self._pending:
+            completed.append(self._collect_oldest())
+        return completed
+
+    def reset(self):
+        """Wait for and discard every pending result, freeing all slots.
+
+        A run that failed part way leaves tasks behind; without this their
+        results would come back from the next ``submit`` or ``drain``.
+        """
+        while self._pending:
+            _, slot, result = self._pending.popleft()
+            result.wait()
+            self._free.append(slot)
+
+    def close(self):
+        self._pending.clear()
+        self._finalizer()
@@ -1,47 +1,184 @@
-from scenedetect import detect, ContentDetector
-import cv2
 import click
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from tqdm import tqdm
+
+from src.extractors.content_scores import (
+    ContentScorer,
+    downscale_factor,
+    filter_cuts,
+    scaled_size,
+)
+from src.utils.frame_source import FrameSource
+from src.utils.sampling import chunk_bounds
+
+
+def _score_chunk(detector, video_path, start_sample, end_sample):
+    """Scores of samples [start_sample, end_sample), seeded with the sample before."""
+    stride = detector.stride
+    first_frame = start_sample * stride
+    end_frame = end_sample * stride if end_sample is not None else None
+    scorer = ContentScorer(detector._size)
+
+    frames, scores = [], []
+    for frame_idx, frame in FrameSource(video_path).frames(
+        [stride], max(0, first_frame - stride), end_frame
+    ):
+        score = scorer.score(frame)
+        if frame_idx >= first_frame:
+            frames.append(frame_idx)
+            scores.append(score)
+    return frames, scores
 
 
 class ShotCutDetector:
-    def __init__(self, threshold=27.0, min_scene_len=15, use_gpu=False):
+    """Content cuts scored and filtered exactly like scenedetect's ``ContentDetector``.
+
+    With ``frame_skip`` only every ``frame_skip + 1``th frame is scored, and
+    the frames spanned by each sample pair above the threshold are rescored
+    one by one afterwards so cuts land on the exact frame. With ``workers``
+    above 1 the video is scored in time chunks by separate processes and the
+    flash filter runs over the merged scores.
+    """
+
+    feature_name = "shot_cuts"
+
+    def __init__(
+        self,
+        threshold=27.0,
+        min_scene_len=15,
+        downscale=None,
+        frame_skip=0,
+        workers=1,
+        chunks=None,
+    ):
         self.threshold = threshold
         self.min_scene_len = min_scene_len
+        self.downscale = downscale
+        self.frame_skip = max(0, int(frame_skip))
+        self.stride = self.frame_skip + 1
+        self.workers = max(1, int(workers))
+        self.chunks = chunks
+
+    @property
+    def standalone(self):
+        return self.workers > 1
+
+    def cache_params(self):
+        return {
+            "threshold": self.threshold,
+            "min_scene_len": self.min_scene_len,
+            "downscale": self.downscale,
+            "frame_skip": self.frame_skip,
+        }
+
+    def begin(self, info):
+        self.info = info
+        self._downscale = downscale_factor(info.width, info.height, self.downscale)
+        self._size = scaled_size(info.width, info.height, self._downscale)
+        self._scorer = ContentScorer(self._size)
+        self._frames = []
+        self._scores = []
 
-    def extract(self, video_path):
         click.echo("")
         click.echo(click.style("INIT", bold=True))
+        click.echo(click.style(f"  DURATION: {info.duration:.2f}s", dim=True))
+        click.echo(click.style(f"  FRAMES: {info.total_frames}", dim=True))
+        click.echo(click.style(f"  FPS: {info.fps:.2f}", dim=True))
+        click.echo(click.style(f"  DOWNSCALE: {self._downscale:.2f}x", dim=True))
+        if self.frame_skip:
+            click.echo(click.style(f"  FRAME SKIP: {self.frame_skip}", dim=True))
 
-        cap = cv2.VideoCapture(video_path)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps
-        cap.release()
+    def frame_format(self):
+        if self._size == (self.info.width, self.info.height):
+            return None
+        return self._size + ("bgr24",)
 
-        click.echo(click.style(f"  DURATION: {duration:.2f}s", dim=True))
-        click.echo(click.style(f"  FRAMES: {total_frames}", dim=True))
-        click.echo(click.style(f"  FPS: {fps:.2f}", dim=True))
-        click.echo("")
-        click.echo(click.style("SCANNING", bold=True))
+    def process_frame(self, frame_idx, frame):
+        self._frames.append(frame_idx)
+        self._scores.append(self._scorer.score(frame))
 
-        scene_list = detect(
-            video_path,
-            ContentDetector(threshold=self.threshold, min_scene_len=self.min_scene_len),
-            show_progress=True,
+    def checkpoint_state(self):
+        arrays = {
+            "frames": np.asarray(self._frames, dtype=np.int64),
+            "scores": np.asarray(self._scores, dtype=np.float64),
+        }
+        if self._scorer.last_hsv is not None:
+            arrays["hsv"] = self._scorer.last_hsv
+        return arrays, {}
+
+    def restore_checkpoint(self, arrays, state):
+        self._frames = arrays["frames"].tolist()
+        self._scores = arrays["scores"].tolist()
+        if "hsv" in arrays:
+            self._scorer.prime(arrays["hsv"])
+
+    def _refine(self, frames, scores):
+        """Rescore every frame spanned by a sample pair above the threshold."""
+        candidates = np.flatnonzero(scores >= self.threshold)
+        candidates = candidates[candidates > 0]
+        if self.stride == 1 or not len(candidates):
+            return frames, scores
+
+        source = FrameSource(self.info.path)
+        refined_frames, refined_scores = [], []
+        for i in candidates:
+            scorer = ContentScorer(self._size)
+            for frame_idx, frame in source.frames([1], frames[i - 1], frames[i] + 1):
+                score = scorer.score(frame)
+                if frame_idx > frames[i - 1]:
+                    refined_frames.append(frame_idx)
+                    refined_scores.append(score)
+
+        keep = np.ones(len(frames), dtype=bool)
+        keep[candidates] = False
+        frames = np.concatenate([frames[keep], refined_frames]).astype(np.int64)
+        scores = np.concatenate([scores[keep], refined_scores])
+        order = np.argsort(frames, kind="stable")
+        return frames[order], scores[order]
+
+    def extract_chunked(self, video_path):
+        source = FrameSource(video_path)
+        self.begin(source.info)
+        bounds = chunk_bounds(
+            source.info.total_frames, self.stride, self.chunks or self.workers * 4
+        )
+
+        click.echo(click.style(f"  CHUNKS: {len(bounds)}", dim=True))
+        click.echo(click.style(f"  WORKERS: {self.workers}", dim=True))
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                executor.submit(_score_chunk, self, video_path, start, end)
+                for start, end in bounds
+            ]
+            for future in tqdm(futures, desc="  Shot chunks", leave=False):
+                frames, scores = future.result()
+                self._frames += frames
+                self._scores += scores
+
+        return self.finalize()
+
+    def finalize(self):
+        frames, scores = self._refine(
+            np.asarray(self._frames, dtype=np.int64),
+            np.asarray(self._scores, dtype=np.float64),
         )
+        cut_frames = filter_cuts(frames, scores, self.threshold, self.min_scene_len)
+        self._frames, self._scores = [], []
 
         click.echo("")
-        click.echo(click.style("PROCESSING", bold=True))
+        click.echo(click.style("SHOT CUTS", bold=True))
 
-        cuts = []
-        for i in range(len(scene_list) - 1):
-            cut_time = scene_list[i][1].get_seconds()
-            cuts.append(round(cut_time, 2))
+        fps = self.info.fps
+        cut_frames = sorted(set(cut_frames))
+        cuts = [round(cut / fps, 2) for cut in cut_frames]
 
-        if len(scene_list) > 1:
+        scene_starts = [0] + cut_frames if cut_frames else []
+        if len(scene_starts) > 1:
             scene_lengths = [
-                (scene_list[i + 1][0] - scene_list[i][0]).get_seconds()
-                for i in range(len(scene_list) - 1)
+                (scene_starts[i + 1] - scene_starts[i]) / fps
+                for i in range(len(scene_starts) - 1)
             ]
             avg_scene_length = sum(scene_lengths) / len(scene_lengths)
         else:
@@ -51,6 +188,11 @@ class ShotCutDetector:
             "total_cuts": len(cuts),
             "cut_timestamps": cuts,
             "avg_scene_length": round(avg_scene_length, 2),
-            "scene_count": len(scene_list),
-            "duration": round(duration, 2),
+            "scene_count": len(scene_starts),
+            "duration": round(self.info.duration, 2),
         }
+
+    def extract(self, video_path):
+        if self.workers > 1:
+            return self.extract_chunked(video_path)
+        return FrameSource(video_path).run([self])[0]
@@ -1,15 +1,22 @@
 import cv2
 import numpy as np
-import pytesseract
 import click
-import re
 import time
-from collections import Counter
-from multiprocessing import Pool, cpu_count
-from tqdm import tqdm
+from multiprocessing import cpu_count
+
+from src.extractors.keywords import STOP_WORDS, KeywordAggregator
+from src.extractors.ocr_backends import resolve_backend
+from src.extractors.ocr_pool import OcrPool, extract_keywords
+from src.extractors.text_regions import find_text_regions, stack_regions
+from src.utils.frame_source import FrameSource
+from src.utils.sampling import parse_sample_rate, resolve_stride
+
+CHANGE_TILE = 32
 
 
 class TextAnalyzer:
+    feature_name = "text"
+
     def __init__(
         self,
         sample_rate=2,
@@ -17,6 +24,14 @@ class TextAnalyzer:
         downscale_width=640,
         workers=None,
         min_confidence=60,
+        queue_depth=None,
+        change_threshold=0.02,
+        detect_regions=False,
+        ocr_backend="auto",
+        stop_words=STOP_WORDS,
+        min_document_frequency=1,
+        keyword_capacity=None,
+        top_k=10,
     ):
         self.sample_rate = sample_rate
         self.lang = lang
@@ -24,144 +39,232 @@ class TextAnalyzer:
         self.tesseract_config = "--psm 6 --oem 3 --dpi 150"
         self.workers = workers or max(1, cpu_count() - 1)
         self.min_confidence = min_confidence
+        self.queue_depth = queue_depth or self.workers * 4
+        self.change_threshold = change_threshold
+        self.detect_regions = detect_regions
+        self.ocr_backend = resolve_backend(ocr_backend, lang, self.tesseract_config)
+        self.stop_words = frozenset(stop_words or ())
+        self.min_document_frequency = min_document_frequency
+        self.keyword_capacity = keyword_capacity
+        self.top_k = top_k
+        self._ocr_pool = None
+
+    def _gray(self, frame):
+        if frame.ndim == 2:
+            return frame
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
     def _preprocess(self, frame):
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = self._gray(frame)
         _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
         kernel = np.ones((2, 2), np.uint8)
         processed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
         return processed
 
     def _extract_keywords(self, data):
-        high_conf_words = []
-        for i, word in enumerate(data["text"]):
-            word_clean = word.strip()
-            if word_clean and len(word_clean) > 2:
-                conf = data["conf"][i]
-                if conf >= self.min_confidence:
-                    word_lower = re.sub(r"[^\w]", "", word_clean.lower())
-                    if word_lower:
-                        high_conf_words.append(word_lower)
-        return high_conf_words
-
-    def _process_frame(self, frame_data):
-        frame_idx, frame = frame_data
+        return extract_keywords(data, self.min_confidence)
+
+    def _scaled_size(self, width, height):
+        return self.downscale_width, int(height * self.downscale_width / width)
+
+    def _resize(self, frame):
         height, width = frame.shape[:2]
-        scale = self.downscale_width / width
-        new_height = int(height * scale)
-        resized = cv2.resize(frame, (self.downscale_width, new_height))
-
-        processed_frame = self._preprocess(resized)
-        ocr_data = pytesseract.image_to_data(
-            processed_frame,
-            lang=self.lang,
-            config=self.tesseract_config,
-            output_type=pytesseract.Output.DICT,
-        )
+        size = self._scaled_size(width, height)
+        if size == (width, height):
+            return frame
+        return cv2.resize(frame, size)
 
-        keywords = []
-        has_text = False
-        if ocr_data and ocr_data["text"]:
-            keywords = self._extract_keywords(ocr_data)
-            if keywords:
-                has_text = True
+    def _prepare_frame(self, frame):
+        return self._preprocess(self._resize(frame))
 
-        return frame_idx, has_text, keywords
+    def _get_pool(self):
+        if self._ocr_pool is None:
+            self._ocr_pool = OcrPool(
+                workers=self.workers,
+                slots=self.queue_depth,
+                lang=self.lang,
+                tesseract_config=self.tesseract_config,
+                min_confidence=self.min_confidence,
+                backend=self.ocr_backend,
+            )
+        return self._ocr_pool
 
-    def _process(self, cap, total_frames):
-        frames_to_process = []
-        frame_idx = 0
+    def close(self):
+        if self._ocr_pool is not None:
+            self._ocr_pool.close()
+            self._ocr_pool = None
 
-        click.echo("")
-        click.echo(click.style("  COLLECTING FRAMES", dim=True))
+    def cache_params(self):
+        return {
+            "sample_rate": parse_sample_rate(self.sample_rate),
+            "lang": self.lang,
+            "downscale_width": self.downscale_width,
+            "tesseract_config": self.tesseract_config,
+            "min_confidence": self.min_confidence,
+            "change_threshold": self.change_threshold,
+            "detect_regions": self.detect_regions,
+            "ocr_backend": self.ocr_backend,
+            "stop_words": sorted(self.stop_words),
+            "min_document_frequency": self.min_document_frequency,
+            "keyword_capacity": self.keyword_capacity,
+            "top_k": self.top_k,
+        }
 
-        with tqdm(
-            total=total_frames,
-            desc="  Sampling",
-            bar_format="  {desc}: {percentage:3.0f}% |{bar}| {n_fmt}/{total_fmt}",
-            leave=False,
-        ) as pbar:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
+    def begin(self, info):
+        self.info = info
+        self.stride = resolve_stride(self.sample_rate, info.fps)
+        self._start_time = time.time()
+        self._text_frames = 0
+        self._sampled_count = 0
+        self._keywords = KeywordAggregator(
+            self.stop_words, self.min_document_frequency, self.keyword_capacity
+        )
+        self._ocr_count = 0
+        self._regionless_count = 0
+        self._reference = None
+        self._reference_tag = None
+        self._reference_result = None
+        self._repeats = {}
+        self._get_pool().reset()
 
-                if frame_idx % self.sample_rate == 0:
-                    frames_to_process.append((frame_idx, frame.copy()))
+        click.echo("")
+        click.echo(click.style("TEXT ANALYSIS", bold=True))
+        click.echo(click.style(f"  SAMPLE RATE: 1/{self.stride}", dim=True))
+        click.echo(
+            click.style(f"  DOWNSCALE WIDTH: {self.downscale_width}px", dim=True)
+        )
+        click.echo(click.style(f"  WORKERS: {self.workers}", dim=True))
+        click.echo(click.style(f"  OCR BACKEND: {self.ocr_backend}", dim=True))
+        click.echo(click.style(f"  QUEUE DEPTH: {self.queue_depth}", dim=True))
+        if self.change_threshold is not None:
+            click.echo(
+                click.style(f"  CHANGE THRESHOLD: {self.change_threshold}", dim=True)
+            )
+        if self.detect_regions:
+            click.echo(click.style("  TEXT REGIONS: on", dim=True))
+        click.echo(click.style(f"  DURATION: {info.duration:.2f}s", dim=True))
 
-                pbar.update(1)
-                frame_idx += 1
+    def _apply(self, frame_idx, result):
+        has_text, counts = result
+        if has_text:
+            self._text_frames += 1
+            self._keywords.add(frame_idx, counts)
 
-        cap.release()
+    def _record(self, completed):
+        for frame_idx, result in completed:
+            self._apply(frame_idx, result)
+            for repeat_idx in self._repeats.pop(frame_idx, ()):
+                self._apply(repeat_idx, result)
+            if frame_idx == self._reference_tag:
+                self._reference_result = result
 
-        text_frames = 0
-        all_keywords = []
-        sampled_count = len(frames_to_process)
+    def _unchanged(self, prepared):
+        """Whether no tile of ``prepared`` differs from the last OCR'd frame by
+        more than ``change_threshold`` of its pixels.
 
-        click.echo("")
-        click.echo(click.style(f"  WORKERS: {self.workers}", dim=True))
-        click.echo(
-            click.style(f"  PROCESSING {sampled_count} FRAMES WITH OCR", dim=True)
+        Comparing per tile rather than over the whole frame keeps a single
+        changed word from being averaged away by the rest of the frame.
+        """
+        reference = self._reference
+        if (
+            self.change_threshold is None
+            or reference is None
+            or reference.shape != prepared.shape
+        ):
+            return False
+        height, width = prepared.shape
+        changed = cv2.resize(
+            cv2.bitwise_xor(reference, prepared),
+            (max(1, width // CHANGE_TILE), max(1, height // CHANGE_TILE)),
+            interpolation=cv2.INTER_AREA,
         )
-        click.echo("")
+        return cv2.minMaxLoc(changed)[1] <= self.change_threshold * 255
 
-        with tqdm(
-            total=sampled_count,
-            desc="OCR Progress",
-            bar_format="  {desc}: {percentage:3.0f}% |{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]",
-        ) as pbar:
-            with Pool(processes=self.workers) as pool:
-                for result in pool.imap_unordered(
-                    self._process_frame, frames_to_process
-                ):
-                    frame_idx, has_text, keywords = result
-                    if has_text:
-                        text_frames += 1
-                        all_keywords.extend(keywords)
-                    pbar.update(1)
+    def frame_format(self):
+        return self._scaled_size(self.info.width, self.info.height) + ("gray",)
 
-        click.echo("")
-        return text_frames, sampled_count, all_keywords
+    def process_frame(self, frame_idx, frame):
+        resized = self._resize(frame)
+        prepared = self._preprocess(resized)
+        self._sampled_count += 1
 
-    def extract(self, video_path):
-        click.echo("")
-        click.echo(click.style("TEXT ANALYSIS", bold=True))
+        if self._unchanged(prepared):
+            if self._reference_result is not None:
+                self._apply(frame_idx, self._reference_result)
+            else:
+                self._repeats.setdefault(self._reference_tag, []).append(frame_idx)
+            return
 
-        start_time = time.time()
+        self._reference = prepared
+        self._reference_tag = frame_idx
+        self._reference_result = None
 
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise ValueError(f"Cannot open video: {video_path}")
+        if self.detect_regions:
+            boxes = find_text_regions(self._gray(resized))
+            if not boxes:
+                self._regionless_count += 1
+                self._reference_result = (False, {})
+                self._apply(frame_idx, self._reference_result)
+                return
+            prepared = stack_regions(prepared, boxes)
 
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps if fps > 0 else 0.0
+        self._ocr_count += 1
+        self._record(self._ocr_pool.submit(frame_idx, prepared))
 
-        click.echo(click.style(f"  SAMPLE RATE: 1/{self.sample_rate}", dim=True))
-        click.echo(
-            click.style(f"  DOWNSCALE WIDTH: {self.downscale_width}px", dim=True)
-        )
-        click.echo(click.style(f"  DURATION: {duration:.2f}s", dim=True))
+    def checkpoint_state(self):
+        self._record(self._ocr_pool.drain())
+        arrays = {} if self._reference is None else {"reference": self._reference}
+        result = self._reference_result
+        return arrays, {
+            "text_frames": self._text_frames,
+            "sampled_count": self._sampled_count,
+            "ocr_count": self._ocr_count,
+            "regionless_count": self._regionless_count,
+            "reference_tag": self._reference_tag,
+            "reference_result": None if result is None else list(result),
+            "keywords": self._keywords.state(),
+            "elapsed": time.time() - self._start_time,
+        }
 
-        text_frames, sampled_count, all_keywords = self._process(cap, total_frames)
+    def restore_checkpoint(self, arrays, state):
+        self._text_frames = state["text_frames"]
+        self._sampled_count = state["sampled_count"]
+        self._ocr_count = state["ocr_count"]
+        self._regionless_count = state["regionless_count"]
+        self._reference = arrays.get("reference")
+        self._reference_tag = state["reference_tag"]
+        result = state["reference_result"]
+        self._reference_result = None if result is None else tuple(result)
+        self._keywords.load_state(state["keywords"])
+        self._start_time = time.time() - state["elapsed"]
 
-        text_present_ratio = text_frames / sampled_count if sampled_count > 0 else 0.0
+    def _process(self):
+        self._record(self._ocr_pool.drain())
+        click.echo("")
+        return self._text_frames, self._sampled_count, self._keywords
 
-        top_keywords = []
-        if all_keywords:
-            keyword_counts = Counter(all_keywords).most_common(10)
-            top_keywords = [{"word": kw[0], "count": kw[1]} for kw in keyword_counts]
+    def finalize(self):
+        text_frames, sampled_count, keywords = self._process()
 
-        elapsed_time = time.time() - start_time
+        text_present_ratio = text_frames / sampled_count if sampled_count > 0 else 0.0
+        top_keywords = keywords.top(self.top_k, self.info.fps)
+
+        elapsed_time = time.time() - self._start_time
 
         click.echo("")
-        click.echo(click.style("COMPLETE", bold=True))
+        click.echo(click.style("TEXT COMPLETE", bold=True))
         click.echo(
             click.style(
                 f"  TEXT RATIO: {text_present_ratio:.2f} ({text_frames}/{sampled_count})",
                 dim=True,
             )
         )
+        click.echo(
+            click.style(
+                f"  OCR CALLS: {self._ocr_count} ({sampled_count - self._ocr_count - self._regionless_count} reused, {self._regionless_count} without text regions)",
+                dim=True,
+            )
+        )
         click.echo(
             click.style(
                 f"  KEYWORDS: {len(top_keywords)} unique",
@@ -174,7 +277,6 @@ class TextAnalyzer:
                 dim=True,
             )
         )
-        click.echo("")
 
         return {
             "text_present_ratio": float(round(text_present_ratio, 2)),
@@ -183,3 +285,6 @@ class TextAnalyzer:
             "top_keywords": top_keywords,
             "processing_time_seconds": float(round(elapsed_time, 2)),
         }
+
+    def extract(self, video_path):
+        return FrameSource(video_path).run([self])[0]
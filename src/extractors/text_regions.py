@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+
+GRADIENT_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+
+def _same_line(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    overlap = min(ay + ah, by + bh) - max(ay, by)
+    gap = max(ax, bx) - min(ax + aw, bx + bw)
+    return overlap > 0.5 * min(ah, bh) and gap < max(ah, bh)
+
+
+def _merge_lines(boxes):
+    merged = []
+    for box in sorted(boxes, key=lambda box: box[0]):
+        for i, line in enumerate(merged):
+            if _same_line(line, box):
+                x, y = min(line[0], box[0]), min(line[1], box[1])
+                right = max(line[0] + line[2], box[0] + box[2])
+                bottom = max(line[1] + line[3], box[1] + box[3])
+                merged[i] = (x, y, right - x, bottom - y)
+                break
+        else:
+            merged.append(box)
+    return merged
+
+
+def find_text_regions(
+    gray,
+    min_contrast=32,
+    min_height=8,
+    max_height_ratio=0.3,
+    min_fill=0.45,
+    max_regions=32,
+):
+    """Candidate text lines in ``gray`` as ``(x, y, w, h)`` boxes.
+
+    Characters have dense, high-contrast edges: the morphological gradient is
+    thresholded, closed horizontally so the glyphs of a line merge into one
+    blob, and blobs are kept when they are line-shaped and mostly edges.
+    Words on the same line are then merged so Tesseract sees whole lines.
+    """
+    height, width = gray.shape
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, GRADIENT_KERNEL)
+    otsu, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if otsu < min_contrast:
+        _, edges = cv2.threshold(gradient, min_contrast, 255, cv2.THRESH_BINARY)
+
+    gap = max(3, width // 80)
+    lines = cv2.morphologyEx(
+        edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (gap, 1))
+    )
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < min_height or h > height * max_height_ratio or w < h:
+            continue
+        if cv2.countNonZero(lines[y : y + h, x : x + w]) < min_fill * w * h:
+            continue
+        boxes.append((x, y, w, h))
+
+    boxes = _merge_lines(boxes)
+    boxes.sort(key=lambda box: box[2] * box[3], reverse=True)
+    return sorted(boxes[:max_regions], key=lambda box: (box[1], box[0]))
+
+
+def stack_regions(image, boxes, pad=6):
+    """Crops of ``image`` stacked top to bottom on a white canvas, one per row.
+
+    Returns ``image`` itself when the stacked crops would not be smaller,
+    since OCR'ing the whole frame is then no more work.
+    """
+    height, width = image.shape[:2]
+    crops = []
+    for x, y, w, h in boxes:
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        crops.append(image[y0 : min(height, y + h + pad), x0 : min(width, x + w + pad)])
+
+    canvas_width = max(crop.shape[1] for crop in crops) + 2 * pad
+    canvas_height = sum(crop.shape[0] + pad for crop in crops) + pad
+    if canvas_width * canvas_height >= width * height:
+        return image
+
+    canvas = np.full((canvas_height, canvas_width), 255, dtype=image.dtype)
+    top = pad
+    for crop in crops:
+        canvas[top : top + crop.shape[0], pad : pad + crop.shape[1]] = crop
+        top += crop.shape[0] + pad
+    return canvas
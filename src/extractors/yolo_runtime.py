@@ -0,0 +1,450 @@
+import ast
+import fcntl
+import re
+import shutil
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+RUNTIMES = ("torch", "onnx", "openvino")
+EXPORT_DIR = "results/.cache/models"
+INPUT_SIZE = 640
+STRIDE = 32
+PAD_VALUE = 114
+CALIBRATION_FRAMES = 64
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+def letterbox_shape(width, height, size=INPUT_SIZE, stride=STRIDE):
+    """``(height, width)`` ultralytics letterboxes a frame to for rectangular inference.
+
+    The frame is scaled so its longer side is ``size`` and the shorter side
+    is padded to the next multiple of ``stride``: 384x640 for 16:9 video.
+    """
+    gain = min(size / height, size / width)
+    new_width, new_height = round(width * gain), round(height * gain)
+    return (
+        new_height + (size - new_height) % stride,
+        new_width + (size - new_width) % stride,
+    )
+
+
+class LetterboxBatch:
+    """Up to ``capacity`` frames letterboxed into one preallocated buffer.
+
+    Each frame is resized straight into its slot of a ``(capacity, height,
+    width, 3)`` buffer, centred and padded like ultralytics' letterbox.
+    ``canvas`` is ``(height, width)`` and defaults to ``size`` square.
+    ``tensor`` converts the filled slots to the normalised RGB NCHW layout the
+    model takes and ``to_source`` maps boxes back to frame coordinates.
+    """
+
+    def __init__(self, capacity, size=INPUT_SIZE, canvas=None):
+        self.size = size
+        self.canvas = tuple(canvas or (size, size))
+        self.images = np.full(
+            (capacity,) + self.canvas + (3,), PAD_VALUE, dtype=np.uint8
+        )
+        self.frame_indices = np.zeros(capacity, dtype=np.int64)
+        self.gains = np.ones(capacity, dtype=np.float32)
+        self.offsets = np.zeros((capacity, 2), dtype=np.float32)
+        self.shapes = np.zeros((capacity, 2), dtype=np.int64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self):
+        return self.count == len(self.images)
+
+    def scaled_size(self, width, height):
+        """Size a ``width`` x ``height`` frame is resized to inside its slot."""
+        gain = min(self.size / height, self.size / width)
+        return round(width * gain), round(height * gain)
+
+    def add(self, frame_idx, frame, source_shape=None):
+        """Letterbox ``frame``, which may already be scaled down from ``source_shape``."""
+        i = self.count
+        height, width = source_shape or frame.shape[:2]
+        gain = min(self.size / height, self.size / width)
+        new_width, new_height = self.scaled_size(width, height)
+        left = round((self.canvas[1] - new_width) / 2 - 0.1)
+        top = round((self.canvas[0] - new_height) / 2 - 0.1)
+
+        slot = self.images[i]
+        if (self.shapes[i] != (height, width)).any():
+            slot.fill(PAD_VALUE)
+            self.shapes[i] = (height, width)
+        view = slot[top : top + new_height, left : left + new_width]
+        if frame.shape[:2] == (new_height, new_width):
+            view[...] = frame
+        else:
+            cv2.resize(frame, (new_width, new_height), dst=view)
+
+        self.frame_indices[i] = frame_idx
+        self.gains[i] = gain
+        self.offsets[i] = (left, top)
+        self.count += 1
+
+    def tensor(self, out):
+        """Fill ``out`` with the filled slots as RGB NCHW in [0, 1]."""
+        out = out[: self.count]
+        rgb = self.images[: self.count, :, :, ::-1].transpose(0, 3, 1, 2)
+        np.multiply(rgb, np.float32(1 / 255), out=out)
+        return out
+
+    def to_source(self, i, xyxy):
+        xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4) - np.tile(
+            self.offsets[i], 2
+        )
+        xyxy /= self.gains[i]
+        height, width = self.shapes[i]
+        np.clip(xyxy[:, 0::2], 0, width, out=xyxy[:, 0::2])
+        np.clip(xyxy[:, 1::2], 0, height, out=xyxy[:, 1::2])
+        return xyxy
+
+    def reset(self):
+        self.count = 0
+
+
+def decode_predictions(prediction, conf, iou=0.7, max_det=300):
+    """Class-aware NMS over one ``(4 + classes, anchors)`` YOLO output.
+
+    Boxes come back as ``xyxy`` in letterboxed input pixels.
+    """
+    class_scores = prediction[4:]
+    cls = class_scores.argmax(0)
+    scores = np.take_along_axis(class_scores, cls[None], 0)[0]
+    keep = scores > conf
+    if not keep.any():
+        return _empty()
+
+    cx, cy, w, h = prediction[:4, keep]
+    cls, scores = cls[keep], scores[keep]
+    corners = np.stack([cx - w / 2, cy - h / 2, w, h], axis=1)
+    selected = cv2.dnn.NMSBoxesBatched(corners, scores, cls.astype(np.int32), conf, iou)
+    selected = np.asarray(selected, dtype=np.int64).reshape(-1)[:max_det]
+
+    xyxy = corners[selected].copy()
+    xyxy[:, 2:] += xyxy[:, :2]
+    return cls[selected].astype(np.int16), scores[selected], xyxy
+
+
+def _empty():
+    return (
+        np.zeros(0, dtype=np.int16),
+        np.zeros(0, dtype=np.float32),
+        np.zeros((0, 4), dtype=np.float32),
+    )
+
+
+def _parse_names(names):
+    if isinstance(names, str):
+        names = ast.literal_eval(names)
+    if isinstance(names, dict):
+        return [str(names[k]) for k in sorted(names)]
+    return [str(name) for name in names or ()]
+
+
+class OnnxSession:
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = int(threads)
+            options.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(
+            str(path), options, providers=["CPUExecutionProvider"]
+        )
+        model_input = self._session.get_inputs()[0]
+        self._input = model_input.name
+        batch, _, height, width = model_input.shape
+        self.batch = batch if isinstance(batch, int) else None
+        static = isinstance(height, int) and isinstance(width, int)
+        self.input_shape = (height, width) if static else None
+        metadata = self._session.get_modelmeta().custom_metadata_map
+        self.names = _parse_names(metadata.get("names"))
+
+    def run(self, tensor):
+        return self._session.run(None, {self._input: tensor})[0]
+
+
+class OpenVinoSession:
+    def __init__(self, path, threads=None):
+        import openvino as ov
+        import yaml
+
+        path = Path(path)
+        core = ov.Core()
+        model = core.read_model(next(path.glob("*.xml")))
+        batch, _, height, width = model.inputs[0].get_partial_shape()
+        self.batch = batch.get_length() if batch.is_static else None
+        static = height.is_static and width.is_static
+        self.input_shape = (height.get_length(), width.get_length()) if static else None
+
+        config = {"PERFORMANCE_HINT": "THROUGHPUT"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = int(threads)
+        self._compiled = core.compile_model(model, "CPU", config)
+
+        metadata = path / "metadata.yaml"
+        names = None
+        if metadata.exists():
+            names = yaml.safe_load(metadata.read_text()).get("names")
+        self.names = _parse_names(names)
+
+    def run(self, tensor):
+        return self._compiled(tensor)[0]
+
+
+SESSIONS = {"onnx": OnnxSession, "openvino": OpenVinoSession}
+
+
+def export_path(weights, runtime, int8=False, export_dir=EXPORT_DIR):
+    stem = Path(weights).stem
+    if runtime == "onnx":
+        # "_int8" files from older releases are dynamically quantized; the
+        # new name keeps them from being picked up as static ones.
+        return Path(export_dir) / f"{stem}{'_int8_qdq' if int8 else ''}.onnx"
+    return Path(export_dir) / f"{stem}{'_int8' if int8 else ''}_openvino_model"
+
+
+def _calibration_images(source, count=CALIBRATION_FRAMES):
+    """Up to ``count`` BGR frames spread over a video or an image directory.
+
+    Without ``source`` this uses the coco8 validation images, the same data
+    ultralytics calibrates OpenVINO INT8 exports on.
+    """
+    if source is None:
+        from ultralytics.data.utils import check_det_dataset
+
+        source = check_det_dataset("coco8.yaml")["val"]
+    source = Path(source)
+    if source.is_dir():
+        paths = sorted(
+            path for path in source.rglob("*") if path.suffix.lower() in IMAGE_SUFFIXES
+        )
+        step = max(1, len(paths) // count)
+        return [cv2.imread(str(path)) for path in paths[::step][:count]]
+
+    capture = cv2.VideoCapture(str(source))
+    total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    frames = []
+    for idx in np.linspace(0, max(total - 1, 0), count).astype(int):
+        capture.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+        ok, frame = capture.read()
+        if ok:
+            frames.append(frame)
+    capture.release()
+    return frames
+
+
+def _float_head_nodes(model):
+    """Detect head nodes that stay in float when quantizing.
+
+    Like the ignored scope ultralytics gives NNCF: only the head's Conv
+    layers are quantized, not DFL, the box decoding or the class sigmoid.
+    The head's last Concat joins pixel boxes with 0-1 scores, which a single
+    INT8 scale cannot hold both of.
+    """
+    layers = [
+        int(match.group(1))
+        for node in model.graph.node
+        if (match := re.match(r"/model\.(\d+)/", node.name))
+    ]
+    if not layers:
+        return []
+    head = f"/model.{max(layers)}/"
+    return [
+        node.name
+        for node in model.graph.node
+        if node.name.startswith(head)
+        and (node.op_type != "Conv" or "/dfl/" in node.name)
+    ]
+
+
+def _quantize_onnx(source, target, calibration=None):
+    """Static QDQ quantization calibrated on letterboxed frames.
+
+    Dynamic quantization turns every Conv into ConvInteger, which the CPU
+    provider runs slower than FP32; QDQ Convs fuse into QLinearConv.
+    """
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    frames = [frame for frame in _calibration_images(calibration) if frame is not None]
+    if not frames:
+        raise ValueError(f"No calibration frames in {calibration}")
+    model = onnx.load(str(source))
+    input_name = model.graph.input[0].name
+
+    class Frames(CalibrationDataReader):
+        def __init__(self):
+            self._frames = iter(frames)
+            self._batch = LetterboxBatch(1)
+            self._tensor = np.empty((1, 3, INPUT_SIZE, INPUT_SIZE), dtype=np.float32)
+
+        def get_next(self):
+            frame = next(self._frames, None)
+            if frame is None:
+                return None
+            self._batch.reset()
+            self._batch.add(0, frame)
+            return {input_name: self._batch.tensor(self._tensor).copy()}
+
+    prepared = target.with_name(target.stem + "_prep.onnx")
+    try:
+        quant_pre_process(str(source), str(prepared), skip_symbolic_shape=True)
+        quantize_static(
+            str(prepared),
+            str(target),
+            Frames(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            nodes_to_exclude=_float_head_nodes(onnx.load(str(prepared))),
+        )
+    finally:
+        prepared.unlink(missing_ok=True)
+    quantized = onnx.load(str(target))
+    keys = {prop.key for prop in quantized.metadata_props}
+    missing = [prop for prop in model.metadata_props if prop.key not in keys]
+    if missing:
+        quantized.metadata_props.extend(missing)
+        onnx.save(quantized, str(target))
+
+
+def export_model(weights, runtime, int8=False, export_dir=EXPORT_DIR, calibration=None):
+    """Path to ``weights`` exported for ``runtime``, exporting on first use.
+
+    ONNX models are exported with a dynamic batch axis and, for ``int8``,
+    statically quantized with ONNX Runtime on frames from ``calibration``
+    (a video or image directory, coco8 by default). OpenVINO INT8 goes
+    through ultralytics' NNCF post-training quantization.
+    """
+    if runtime not in SESSIONS:
+        raise ValueError(f"Unknown runtime {runtime!r}, expected one of {RUNTIMES}")
+    target = export_path(weights, runtime, int8, export_dir)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    # Batch jobs start together and ultralytics exports next to the weights,
+    # so only one process exports while the others wait for the result.
+    with open(target.parent / ".export.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if target.exists():
+            return target
+
+        from ultralytics import YOLO
+
+        model = YOLO(weights)
+        if runtime == "onnx":
+            exported = Path(
+                model.export(
+                    format="onnx", imgsz=INPUT_SIZE, dynamic=True, simplify=True
+                )
+            )
+            if int8:
+                _quantize_onnx(exported, target, calibration)
+                exported.unlink()
+            else:
+                shutil.move(exported, target)
+        else:
+            exported = Path(
+                model.export(
+                    format="openvino", imgsz=INPUT_SIZE, dynamic=True, int8=int8
+                )
+            )
+            shutil.move(exported, target)
+    return target
+
+
+class ExportedDetector:
+    """YOLO inference on an exported model through ONNX Runtime or OpenVINO.
+
+    Takes batches prepared by ``LetterboxBatch`` and mirrors ultralytics'
+    postprocessing: class-aware NMS at IoU 0.7 over the best class per box.
+    """
+
+    def __init__(self, path, runtime, threads=None, iou=0.7):
+        self.path = Path(path)
+        self.runtime = runtime
+        self.model_name = self.path.name
+        self.iou = iou
+        self._session = SESSIONS[runtime](self.path, threads)
+        self.names = self._session.names
+        # ``(height, width)`` for exports without dynamic spatial axes
+        self.input_shape = self._session.input_shape
+
+    def _infer(self, tensor):
+        batch = self._session.batch
+        if batch is None or batch == len(tensor):
+            return self._session.run(tensor)
+        outputs = []
+        for start in range(0, len(tensor), batch):
+            chunk = tensor[start : start + batch]
+            if len(chunk) < batch:
+                # Static batch axis: pad the last chunk and drop the padding.
+                padded = np.zeros((batch,) + chunk.shape[1:], dtype=chunk.dtype)
+                padded[: len(chunk)] = chunk
+                outputs.append(self._session.run(padded)[: len(chunk)])
+            else:
+                outputs.append(self._session.run(chunk))
+        return np.concatenate(outputs)
+
+    def detect(self, tensor, conf):
+        """Detections for a normalised NCHW batch, boxes in input pixels."""
+        return [
+            decode_predictions(prediction, conf, self.iou)
+            for prediction in self._infer(tensor)
+        ]
+
+
+def _box_iou(a, b):
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    overlap = np.clip(bottom_right - top_left, 0, None).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return overlap / np.maximum(area_a[:, None] + area_b[None] - overlap, 1e-9)
+
+
+def match_detections(reference, candidate, conf_threshold, iou=0.5):
+    """Fraction of boxes above ``conf_threshold`` that both runs agree on.
+
+    Boxes match greedily within the same frame and class at IoU >= ``iou``;
+    the count is divided by the larger of the two box totals.
+    """
+
+    def above(detections):
+        keep = detections["conf"] > conf_threshold
+        return {key: detections[key][keep] for key in ("frame", "cls", "boxes")}
+
+    reference, candidate = above(reference), above(candidate)
+    total = max(len(reference["cls"]), len(candidate["cls"]))
+    if total == 0:
+        return 1.0
+
+    matched = 0
+    for frame, cls in set(zip(reference["frame"].tolist(), reference["cls"].tolist())):
+        ref = (reference["frame"] == frame) & (reference["cls"] == cls)
+        cand = (candidate["frame"] == frame) & (candidate["cls"] == cls)
+        if not cand.any():
+            continue
+        overlaps = _box_iou(reference["boxes"][ref], candidate["boxes"][cand])
+        while overlaps.size and overlaps.max() >= iou:
+            i, j = np.unravel_index(overlaps.argmax(), overlaps.shape)
+            overlaps[i, :] = 0
+            overlaps[:, j] = 0
+            matched += 1
+    return matched / total
@@ -0,0 +1,115 @@
+import sys
+import time
+
+import click
+
+from src.cli import bold, dim
+from src.extractors.object_dominance import ObjectDominanceAnalyzer
+from src.extractors.yolo_runtime import EXPORT_DIR, RUNTIMES, match_detections
+
+
+def _relative_change(reference, candidate):
+    if reference == 0:
+        return 0.0 if candidate == 0 else 1.0
+    return abs(candidate - reference) / reference
+
+
+@click.command()
+@click.option("--model", "model_name", default="yolo12n.pt", help="YOLO weights")
+@click.option(
+    "--runtime",
+    default="onnx",
+    type=click.Choice([runtime for runtime in RUNTIMES if runtime != "torch"]),
+    help="Export target",
+)
+@click.option("--int8/--no-int8", default=False, help="Quantize to INT8")
+@click.option("--export-dir", default=EXPORT_DIR, help="Where exported models go")
+@click.option(
+    "--calibration",
+    type=click.Path(exists=True),
+    default=None,
+    help="Video or image directory to calibrate ONNX INT8 on (default: coco8)",
+)
+@click.option(
+    "--verify",
+    "video_path",
+    type=click.Path(exists=True),
+    default=None,
+    help="Compare the exported model against PyTorch on this video",
+)
+@click.option("--sample-rate", default="1fps", help="Frames compared when verifying")
+@click.option("--conf", default=0.5, help="Confidence threshold for the comparison")
+@click.option(
+    "--tolerance",
+    default=0.05,
+    help="Largest allowed change in person/object counts and box disagreement",
+)
+def main(
+    model_name,
+    runtime,
+    int8,
+    export_dir,
+    calibration,
+    video_path,
+    sample_rate,
+    conf,
+    tolerance,
+):
+    """Export YOLO for ONNX Runtime or OpenVINO and check it against PyTorch."""
+    exported = ObjectDominanceAnalyzer(
+        sample_rate=sample_rate,
+        conf_threshold=conf,
+        model_name=model_name,
+        runtime=runtime,
+        int8=int8,
+        export_dir=export_dir,
+        calibration=calibration,
+    )
+    click.echo("")
+    click.echo(bold("MODEL EXPORT"))
+    click.echo(dim(f"  MODEL: {model_name}"))
+    click.echo(dim(f"  EXPORTED: {exported.model.path}"))
+    if not video_path:
+        return
+
+    baseline = ObjectDominanceAnalyzer(
+        sample_rate=sample_rate, conf_threshold=conf, model_name=model_name
+    )
+    start = time.perf_counter()
+    expected = baseline.extract(video_path)
+    baseline_time = time.perf_counter() - start
+    start = time.perf_counter()
+    actual = exported.extract(video_path)
+    exported_time = time.perf_counter() - start
+
+    persons = _relative_change(expected["total_persons"], actual["total_persons"])
+    objects = _relative_change(expected["total_objects"], actual["total_objects"])
+    agreement = match_detections(baseline.detections, exported.detections, conf)
+    passed = max(persons, objects, 1 - agreement) <= tolerance
+
+    click.echo("")
+    click.echo(bold("VERIFY " + ("PASSED" if passed else "FAILED")))
+    click.echo(
+        dim(
+            f"  PERSONS: {expected['total_persons']} -> {actual['total_persons']} ({persons:.1%})"
+        )
+    )
+    click.echo(
+        dim(
+            f"  OBJECTS: {expected['total_objects']} -> {actual['total_objects']} ({objects:.1%})"
+        )
+    )
+    click.echo(dim(f"  MATCHED BOXES: {agreement:.1%}"))
+    click.echo(
+        dim(
+            f"  TIME: {baseline_time:.2f}s -> {exported_time:.2f}s"
+            f" ({baseline_time / max(exported_time, 1e-9):.2f}x)"
+        )
+    )
+    click.echo(dim(f"  TOLERANCE: {tolerance:.1%}"))
+    if not passed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
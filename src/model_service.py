@@ -0,0 +1,266 @@
+import io
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import click
+import numpy as np
+
+DEFAULT_SOCKET = "/tmp/video-core-model.sock"
+_HEADER = struct.Struct("!Q")
+
+
+def send_message(stream, arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    payload = buffer.getbuffer()
+    stream.write(_HEADER.pack(len(payload)))
+    stream.write(payload)
+    stream.flush()
+
+
+def recv_message(stream):
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    (size,) = _HEADER.unpack(header)
+    payload = stream.read(size)
+    if len(payload) < size:
+        return None
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _above(detection, conf):
+    cls, scores, xyxy = detection
+    keep = scores > conf
+    return cls[keep], scores[keep], xyxy[keep]
+
+
+class _Request:
+    def __init__(self, images, conf):
+        self.images = images
+        self.conf = conf
+        self.detections = None
+        self.error = None
+        self._done = threading.Event()
+
+    def finish(self, detections=None, error=None):
+        self.detections = detections
+        self.error = error
+        self._done.set()
+
+    def wait(self):
+        self._done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.detections
+
+
+class ModelService:
+    """Keeps one YOLO model warm and batches frames across all connected clients.
+
+    Requests queue up while the model is busy. The batcher then takes as many
+    as fit in ``max_batch`` images, waiting at most ``max_wait`` seconds for
+    more to arrive, and runs them through the model in a single call.
+    """
+
+    def __init__(self, model_name, device="cpu", max_batch=32, max_wait=0.005):
+        from ultralytics import YOLO
+
+        self.model_name = model_name
+        self.device = device
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max_wait
+        self.model = YOLO(model_name)
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._batch_loop, name="batcher", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def names(self):
+        names = getattr(self.model, "names", None) or {}
+        if isinstance(names, dict):
+            return [str(names[k]) for k in sorted(names)]
+        return [str(v) for v in names]
+
+    def infer(self, images, conf):
+        request = _Request(images, conf)
+        self._requests.put(request)
+        return request.wait()
+
+    def _collect(self):
+        batch = [self._requests.get()]
+        if batch[0] is None:
+            return None
+        size = len(batch[0].images)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            try:
+                request = self._requests.get(
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                break
+            if request is None:
+                self._requests.put(None)
+                break
+            batch.append(request)
+            size += len(request.images)
+        return batch
+
+    def _batch_loop(self):
+        from src.extractors.object_dominance import results_to_detections
+
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            images = [image for request in batch for image in request.images]
+            conf = min(request.conf for request in batch)
+            try:
+                results = self.model(
+                    images, verbose=False, device=self.device, conf=conf
+                )
+                detections = results_to_detections(results)
+            except Exception as e:
+                for request in batch:
+                    request.finish(error=RuntimeError(f"Inference failed: {e}"))
+                continue
+
+            offset = 0
+            for request in batch:
+                own = detections[offset : offset + len(request.images)]
+                offset += len(request.images)
+                if request.conf > conf:
+                    own = [_above(detection, request.conf) for detection in own]
+                request.finish(own)
+
+    def close(self):
+        self._requests.put(None)
+        self._thread.join()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        service = self.server.service
+        while True:
+            message = recv_message(self.rfile)
+            if message is None:
+                return
+            try:
+                reply = self._dispatch(service, message)
+            except Exception as e:
+                reply = {"error": np.array(str(e))}
+            send_message(self.wfile, reply)
+
+    def _dispatch(self, service, message):
+        op = str(message["op"])
+        if op == "info":
+            return {
+                "model": np.array(service.model_name),
+                "names": np.array(service.names),
+            }
+        if op == "detect":
+            images = [message[f"image_{i}"] for i in range(int(message["count"]))]
+            reply = {}
+            for i, (cls, conf, xyxy) in enumerate(
+                service.infer(images, float(message["conf"]))
+            ):
+                reply[f"cls_{i}"] = cls
+                reply[f"conf_{i}"] = conf
+                reply[f"xyxy_{i}"] = xyxy
+            return reply
+        raise ValueError(f"Unknown op {op!r}")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class ModelClient:
+    """Connection to a running model service, used in place of a local YOLO model."""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(socket_path)
+        self._stream = self._socket.makefile("rwb")
+        self._lock = threading.Lock()
+
+        info = self._call({"op": np.array("info")})
+        self.model_name = str(info["model"])
+        self.names = [str(name) for name in info["names"]]
+
+    def _call(self, arrays):
+        with self._lock:
+            send_message(self._stream, arrays)
+            reply = recv_message(self._stream)
+        if reply is None:
+            raise ConnectionError(f"Model service at {self.socket_path} hung up")
+        if "error" in reply:
+            raise RuntimeError(str(reply["error"]))
+        return reply
+
+    def detect(self, frames, conf):
+        arrays = {f"image_{i}": frame for i, frame in enumerate(frames)}
+        arrays.update(
+            op=np.array("detect"), count=np.int64(len(frames)), conf=np.float32(conf)
+        )
+        reply = self._call(arrays)
+        return [
+            (reply[f"cls_{i}"], reply[f"conf_{i}"], reply[f"xyxy_{i}"])
+            for i in range(len(frames))
+        ]
+
+    def close(self):
+        self._stream.close()
+        self._socket.close()
+
+
+@click.command()
+@click.option("--socket", "socket_path", default=DEFAULT_SOCKET, help="Unix socket")
+@click.option("--model", "model_name", default="yolo12n.pt", help="YOLO weights")
+@click.option("--device", default="cpu", help="Inference device")
+@click.option("--max-batch", default=32, help="Most frames per model call")
+@click.option("--max-wait-ms", default=5.0, help="How long a batch waits to fill up")
+@click.option("--threads", default=None, type=int, help="Torch intra-op threads")
+def main(socket_path, model_name, device, max_batch, max_wait_ms, threads):
+    """Serve YOLO inference to analyzers started with --model-service."""
+    if threads:
+        import torch
+
+        torch.set_num_threads(threads)
+
+    service = ModelService(model_name, device, max_batch, max_wait_ms / 1000)
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = _Server(socket_path, _Handler)
+    server.service = service
+
+    click.echo("")
+    click.echo(click.style("MODEL SERVICE", bold=True))
+    click.echo(click.style(f"  MODEL: {model_name}", dim=True))
+    click.echo(click.style(f"  DEVICE: {device}", dim=True))
+    click.echo(click.style(f"  MAX BATCH: {max_batch}", dim=True))
+    click.echo(click.style(f"  SOCKET: {socket_path}", dim=True))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("")
+        click.echo(click.style("INTERRUPT", bold=True))
+    finally:
+        server.server_close()
+        service.close()
+        os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    main()
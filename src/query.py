@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+
+import click
+
+from src.cli import bold, dim
+from src.utils.results_store import (
+    DB_NAME,
+    QUERY_COLUMNS,
+    ResultsStore,
+    parse_filter,
+    to_output,
+)
+
+TABLE_COLUMNS = (
+    "name",
+    "duration",
+    "total_cuts",
+    "p90_motion",
+    "motion_intensity",
+    "text_present_ratio",
+    "person_object_ratio",
+    "path",
+)
+
+
+def _parse_filters(ctx, param, value):
+    try:
+        return [parse_filter(expression) for expression in value]
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+def _format(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def _import_outputs(store, paths):
+    outputs = []
+    for path in paths:
+        path = Path(path)
+        files = [path] if path.is_file() else sorted(path.rglob("output.json"))
+        for output_file in files:
+            with open(output_file) as f:
+                outputs.append(json.load(f))
+    store.add_many(outputs)
+    return len(outputs)
+
+
+@click.command()
+@click.argument("filters", nargs=-1, callback=_parse_filters)
+@click.option(
+    "--db", default=f"results/{DB_NAME}", help="SQLite results database to query"
+)
+@click.option(
+    "--keyword",
+    "keywords",
+    multiple=True,
+    help="Only videos with this word among their top keywords (repeatable)",
+)
+@click.option(
+    "--order-by",
+    default="name",
+    type=click.Choice(QUERY_COLUMNS + tuple(f"-{c}" for c in QUERY_COLUMNS)),
+    help="Sort column, prefixed with - for descending",
+)
+@click.option("--limit", default=None, type=int, help="Maximum number of videos")
+@click.option(
+    "--format",
+    "output_format",
+    default="table",
+    type=click.Choice(["table", "paths", "json"]),
+    help="Print a table, one path per line, or output.json documents as JSON lines",
+)
+@click.option(
+    "--import",
+    "imports",
+    multiple=True,
+    type=click.Path(exists=True),
+    help="Load output.json files from this file or folder first (repeatable)",
+)
+def main(filters, db, keywords, order_by, limit, output_format, imports):
+    """Query stored video features, e.g. motion_intensity=high 'text_present_ratio>0.5'."""
+    store = ResultsStore(db)
+    if imports:
+        imported = _import_outputs(store, imports)
+        click.echo(dim(f"IMPORTED: {imported} videos"), err=True)
+
+    rows = store.query(filters, keywords, order_by, limit)
+    store.close()
+
+    if output_format == "json":
+        for row in rows:
+            click.echo(json.dumps(to_output(row)))
+        return
+    if output_format == "paths":
+        for row in rows:
+            click.echo(row["path"])
+        return
+
+    table = [TABLE_COLUMNS] + [
+        tuple(_format(row[column]) for column in TABLE_COLUMNS) for row in rows
+    ]
+    widths = [max(len(line[i]) for line in table) for i in range(len(TABLE_COLUMNS))]
+    click.echo("")
+    click.echo(bold("  ".join(h.upper().ljust(w) for h, w in zip(table[0], widths))))
+    for line in table[1:]:
+        click.echo("  ".join(value.ljust(w) for value, w in zip(line, widths)))
+    click.echo("")
+    click.echo(dim(f"MATCHES: {len(rows)}"))
+
+
+if __name__ == "__main__":
+    main()
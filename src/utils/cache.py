@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+HEAD_BYTES = 1 << 20
+PROBE_BYTES = 1 << 16
+PROBE_COUNT = 8
+
+
+def fingerprint_video(video_path):
+    size = os.path.getsize(video_path)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+
+    offsets = [0, max(0, size - HEAD_BYTES)]
+    offsets += [size * (i + 1) // (PROBE_COUNT + 1) for i in range(PROBE_COUNT)]
+
+    with open(video_path, "rb") as f:
+        for i, offset in enumerate(offsets):
+            f.seek(offset)
+            digest.update(f.read(HEAD_BYTES if i < 2 else PROBE_BYTES))
+
+    return digest.hexdigest()
+
+
+def save_arrays(path, arrays):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_arrays(path):
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def params_digest(params):
+    encoded = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+class ResultCache:
+    """Per-extractor results keyed on a video fingerprint and the extractor's parameters."""
+
+    def __init__(self, root="results/.cache"):
+        self.root = Path(root)
+
+    def path(self, fingerprint, name, params, suffix=".json"):
+        return self.root / fingerprint / f"{name}-{params_digest(params)}{suffix}"
+
+    def get(self, fingerprint, name, params):
+        path = self.path(fingerprint, name, params)
+        if not path.exists():
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)["result"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, fingerprint, name, params, result):
+        path = self.path(fingerprint, name, params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"params": params, "result": result}, f)
+        os.replace(tmp_path, path)
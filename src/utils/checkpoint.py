@@ -0,0 +1,116 @@
+import json
+import time
+from pathlib import Path
+
+import click
+import numpy as np
+
+from src.utils.cache import load_arrays, params_digest, save_arrays
+
+CHECKPOINT_INTERVAL = 60.0
+
+
+class Checkpoint:
+    """Partial state of one extractor on one video, saved atomically.
+
+    A checkpoint is one ``.npz`` holding the extractor's arrays, its other
+    state as a JSON document and the last frame index that state covers.
+    """
+
+    def __init__(self, path, interval=CHECKPOINT_INTERVAL):
+        self.path = Path(path)
+        self.interval = interval
+        self._saved_at = time.monotonic()
+
+    def due(self):
+        return time.monotonic() - self._saved_at >= self.interval
+
+    def save(self, frame_idx, arrays, state):
+        save_arrays(
+            self.path,
+            {
+                **arrays,
+                "_frame": np.int64(frame_idx),
+                "_state": np.array(json.dumps(state)),
+            },
+        )
+        self._saved_at = time.monotonic()
+
+    def load(self):
+        if not self.path.exists():
+            return None
+        try:
+            arrays = load_arrays(self.path)
+            frame_idx = int(arrays.pop("_frame"))
+            state = json.loads(str(arrays.pop("_state")))
+        except (OSError, ValueError, KeyError):
+            return None
+        return frame_idx, arrays, state
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+
+class Checkpointed:
+    """Frame consumer wrapper that checkpoints ``consumer`` and resumes it.
+
+    ``consumer`` provides ``checkpoint_state()``, returning ``(arrays,
+    state)`` that cover every frame it has been given, and
+    ``restore_checkpoint(arrays, state)``, called after ``begin``. Frames up
+    to the restored checkpoint are dropped, and ``start_frame`` tells the
+    frame source where decoding can start.
+    """
+
+    def __init__(self, consumer, checkpoint):
+        self.consumer = consumer
+        self.checkpoint = checkpoint
+        self.start_frame = 0
+
+    def __getattr__(self, name):
+        return getattr(self.consumer, name)
+
+    def begin(self, info):
+        self.consumer.begin(info)
+        self.start_frame = 0
+        saved = self.checkpoint.load()
+        if saved is not None:
+            frame_idx, arrays, state = saved
+            self.consumer.restore_checkpoint(arrays, state)
+            self.start_frame = frame_idx + 1
+            click.echo(click.style(f"  RESUMED: frame {self.start_frame}", dim=True))
+
+    def process_frame(self, frame_idx, frame):
+        if frame_idx < self.start_frame:
+            return
+        self.consumer.process_frame(frame_idx, frame)
+        if self.checkpoint.due():
+            self.checkpoint.save(frame_idx, *self.consumer.checkpoint_state())
+
+    def finalize(self):
+        return self.consumer.finalize()
+
+
+class CheckpointStore:
+    """Checkpoints keyed like ``ResultCache`` on the video and extractor parameters."""
+
+    def __init__(self, root="results/.cache", interval=CHECKPOINT_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+
+    def path(self, fingerprint, extractor):
+        digest = params_digest(extractor.cache_params())
+        return (
+            self.root
+            / fingerprint
+            / f"{extractor.feature_name}-{digest}.checkpoint.npz"
+        )
+
+    def attach(self, fingerprint, extractor):
+        """``extractor`` wrapped to checkpoint, if it supports checkpoints."""
+        if not hasattr(extractor, "checkpoint_state"):
+            return extractor
+        checkpoint = Checkpoint(self.path(fingerprint, extractor), self.interval)
+        return Checkpointed(extractor, checkpoint)
+
+    def clear(self, fingerprint, extractor):
+        self.path(fingerprint, extractor).unlink(missing_ok=True)
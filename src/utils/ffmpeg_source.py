@@ -0,0 +1,270 @@
+import fcntl
+import os
+import shutil
+import subprocess
+import tempfile
+
+import click
+import numpy as np
+from tqdm import tqdm
+
+from src.utils.frame_source import FrameSource, probe_video
+
+CHANNELS = {"bgr24": 3, "gray": 1}
+PIPE_SIZE = 1 << 20
+
+
+def _select(strides, start_frame=0, end_frame=None):
+    """``select`` filter keeping frame numbers any of ``strides`` samples."""
+    terms = [f"not(mod(n\\,{stride}))" for stride in sorted(set(strides))]
+    expr = "+".join(terms) if 1 not in strides else "1"
+    if start_frame:
+        expr = f"gte(n\\,{start_frame})*({expr})"
+    if end_frame is not None:
+        expr = f"lt(n\\,{end_frame})*({expr})"
+    return None if expr == "1" else f"select='{expr}'"
+
+
+def _read_frame(pipe, buffer):
+    view = memoryview(buffer.reshape(-1))
+    filled = 0
+    while filled < len(view):
+        n = pipe.readinto(view[filled:])
+        if not n:
+            return False
+        filled += n
+    return True
+
+
+class _Output:
+    """One raw video stream from ffmpeg read into a ring of reused buffers."""
+
+    def __init__(self, info, stride=1, frame_format=None, buffers=1, start_frame=0):
+        self.stride = stride
+        self.start_frame = start_frame
+        width, height, self.pix_fmt = frame_format or (
+            info.width,
+            info.height,
+            "bgr24",
+        )
+        self.size = (width, height)
+        self.scaled = self.size != (info.width, info.height)
+        shape = (height, width, CHANNELS[self.pix_fmt])
+        if self.pix_fmt == "gray":
+            shape = shape[:2]
+        self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(buffers)]
+        self._next = 0
+        self.pipe = None
+
+    def open_pipe(self):
+        """Create the pipe and return the end ffmpeg writes to."""
+        read_fd, write_fd = os.pipe()
+        if hasattr(fcntl, "F_SETPIPE_SZ"):
+            try:
+                fcntl.fcntl(write_fd, fcntl.F_SETPIPE_SZ, PIPE_SIZE)
+            except OSError:
+                pass
+        self.pipe = os.fdopen(read_fd, "rb", buffering=0)
+        return write_fd
+
+    def filters(self):
+        filters = [_select([self.stride], self.start_frame)]
+        if self.scaled:
+            filters.append("scale={}:{}:flags=bilinear".format(*self.size))
+        filters.append(f"format={self.pix_fmt}")
+        return ",".join(f for f in filters if f)
+
+    def read(self):
+        buffer = self.buffers[self._next]
+        self._next = (self._next + 1) % len(self.buffers)
+        return buffer if _read_frame(self.pipe, buffer) else None
+
+
+class FfmpegFrameSource(FrameSource):
+    """``FrameSource`` that decodes with an ``ffmpeg`` subprocess.
+
+    ffmpeg decodes with ``threads`` threads (0 lets it choose) and drops
+    unsampled frames with a ``select`` filter before they are converted.
+    Consumers that define ``frame_format()`` returning ``(width, height,
+    pix_fmt)`` after ``begin`` get their frames scaled and converted
+    (``bgr24`` or ``gray``) by ffmpeg on a pipe of their own; the others get
+    full-size BGR frames.
+
+    Frames are read into reused buffers, so a consumer must copy anything it
+    keeps past ``process_frame``. With ``parallel=True`` each consumer has a
+    ring of ``queue_depth + 2`` buffers so queued frames stay intact.
+    """
+
+    def __init__(
+        self, video_path, parallel=False, queue_depth=8, threads=0, ffmpeg="ffmpeg"
+    ):
+        self.video_path = str(video_path)
+        self.parallel = parallel
+        self.queue_depth = queue_depth
+        self.threads = threads
+        self.ffmpeg = shutil.which(ffmpeg)
+        if self.ffmpeg is None:
+            raise RuntimeError(f"{ffmpeg} not found on PATH")
+        self.info = probe_video(self.video_path)
+
+    def _start(self, filter_graph, outputs, **kwargs):
+        command = [
+            self.ffmpeg,
+            "-hide_banner",
+            "-nostdin",
+            "-loglevel",
+            "error",
+            "-threads",
+            str(self.threads),
+            "-i",
+            self.video_path,
+            "-filter_complex",
+            filter_graph,
+        ]
+        if self.threads:
+            command += ["-filter_complex_threads", str(self.threads)]
+        for label, pix_fmt, target in outputs:
+            command += [
+                "-map",
+                f"[{label}]",
+                "-an",
+                "-sn",
+                "-dn",
+                "-fps_mode",
+                "passthrough",
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                pix_fmt,
+                target,
+            ]
+        # A file rather than a pipe, so a chatty ffmpeg can never block on it.
+        stderr = tempfile.TemporaryFile()
+        return subprocess.Popen(command, stderr=stderr, **kwargs), stderr
+
+    def _wait(self, process, stderr):
+        returncode = process.wait()
+        stderr.seek(0)
+        message = stderr.read().decode(errors="replace").strip()
+        stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed on {self.video_path}: {message}")
+
+    def frames(self, strides, start_frame=0, end_frame=None, on_advance=None):
+        output = _Output(self.info)
+        select = _select(strides, start_frame, end_frame)
+        graph = f"[0:v]{select + ',' if select else ''}format=bgr24[out]"
+        process, stderr = self._start(
+            graph, [("out", "bgr24", "pipe:1")], stdout=subprocess.PIPE
+        )
+        output.pipe = process.stdout
+        advance = on_advance or (lambda n: None)
+        frame_idx = -1
+
+        try:
+            while True:
+                next_idx = self._next_sampled(max(frame_idx + 1, start_frame), strides)
+                if end_frame is not None and next_idx >= end_frame:
+                    break
+                frame = output.read()
+                if frame is None:
+                    break
+                advance(next_idx - frame_idx)
+                frame_idx = next_idx
+                yield frame_idx, frame
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+            stderr.close()
+
+    def run(self, consumers):
+        for consumer in consumers:
+            consumer.begin(self.info)
+        if not consumers:
+            return []
+
+        dispatchers, workers = self._dispatchers(consumers)
+        buffers = self.queue_depth + 2 if workers else 1
+        start_frame = min(getattr(consumer, "start_frame", 0) for consumer in consumers)
+        outputs = [
+            _Output(
+                self.info,
+                consumer.stride,
+                consumer.frame_format() if hasattr(consumer, "frame_format") else None,
+                buffers,
+                start_frame,
+            )
+            for consumer in consumers
+        ]
+        strides = [output.stride for output in outputs]
+        write_fds = [output.open_pipe() for output in outputs]
+
+        split = f"[0:v]split={len(outputs)}" + "".join(
+            f"[in{i}]" for i in range(len(outputs))
+        )
+        graph = ";".join(
+            [split]
+            + [f"[in{i}]{output.filters()}[out{i}]" for i, output in enumerate(outputs)]
+        )
+        try:
+            process, stderr = self._start(
+                graph,
+                [
+                    (f"out{i}", output.pix_fmt, f"pipe:{fd}")
+                    for i, (output, fd) in enumerate(zip(outputs, write_fds))
+                ],
+                stdout=subprocess.DEVNULL,
+                pass_fds=write_fds,
+            )
+        finally:
+            for fd in write_fds:
+                os.close(fd)
+
+        click.echo("")
+        click.echo(
+            click.style(
+                f"  SAMPLING: ffmpeg select (stride {min(strides)}, "
+                f"{len(outputs)} output{'s' if len(outputs) > 1 else ''})",
+                dim=True,
+            )
+        )
+
+        total = self.info.total_frames if self.info.total_frames > 0 else None
+        try:
+            with tqdm(
+                total=total,
+                desc="  Decoding",
+                bar_format="  {desc}: {percentage:3.0f}% |{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]",
+                leave=False,
+            ) as pbar:
+                # ffmpeg emits frames in decode order on every output, so
+                # reading them in that order never stalls one pipe on another.
+                frame_idx = start_frame - 1
+                pbar.update(start_frame)
+                while True:
+                    next_idx = self._next_sampled(frame_idx + 1, strides)
+                    due = [
+                        (dispatch, output)
+                        for dispatch, output in zip(dispatchers, outputs)
+                        if next_idx % output.stride == 0
+                    ]
+                    frames = [output.read() for _, output in due]
+                    if any(frame is None for frame in frames):
+                        break
+                    for (dispatch, _), frame in zip(due, frames):
+                        dispatch(next_idx, frame)
+                    pbar.update(next_idx - frame_idx)
+                    frame_idx = next_idx
+            for worker in workers:
+                worker.close()
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            for worker in workers:
+                worker.abort()
+            for output in outputs:
+                output.pipe.close()
+        self._wait(process, stderr)
+        return [consumer.finalize() for consumer in consumers]
@@ -0,0 +1,175 @@
+import click
+import cv2
+from dataclasses import dataclass
+from tqdm import tqdm
+
+from src.utils.sampling import SEEK_THRESHOLD, sampling_strategy
+from src.utils.workers import BackgroundWorker
+
+DECODERS = ("opencv", "ffmpeg")
+
+
+@dataclass(frozen=True)
+class VideoInfo:
+    path: str
+    total_frames: int
+    fps: float
+    width: int
+    height: int
+
+    @property
+    def duration(self):
+        return self.total_frames / self.fps if self.fps > 0 else 0.0
+
+
+def open_capture(video_path):
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+    return cap
+
+
+def probe_video(video_path):
+    cap = open_capture(video_path)
+    info = VideoInfo(
+        path=str(video_path),
+        total_frames=int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0),
+        fps=cap.get(cv2.CAP_PROP_FPS),
+        width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+        height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+    )
+    cap.release()
+    return info
+
+
+def seek(cap, frame_idx):
+    if not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx):
+        return False
+    return int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx
+
+
+class FrameSource:
+    """Decodes a video once and fans every frame out to the consumers that sample it.
+
+    A consumer exposes the ``begin(info)``, ``process_frame(frame_idx, frame)``
+    and ``finalize()`` hooks and sets ``stride`` in ``begin``. Frames are
+    shared between consumers and must be treated as read-only. Decoding starts
+    at the lowest ``start_frame`` of the consumers that set one. Frames that no
+    consumer samples are grabbed without being retrieved, and gaps of at least
+    ``seek_threshold`` frames are skipped with a seek.
+
+    With ``parallel=True`` each consumer runs ``process_frame`` on its own
+    thread behind a queue of ``queue_depth`` frames, so the extractors
+    overlap with each other and with decoding.
+    """
+
+    def __init__(
+        self, video_path, seek_threshold=SEEK_THRESHOLD, parallel=False, queue_depth=8
+    ):
+        self.video_path = str(video_path)
+        self.seek_threshold = seek_threshold
+        self.parallel = parallel
+        self.queue_depth = queue_depth
+        self.info = probe_video(self.video_path)
+
+    def _dispatchers(self, consumers):
+        if not self.parallel or len(consumers) < 2:
+            return [consumer.process_frame for consumer in consumers], []
+
+        workers = [
+            BackgroundWorker(
+                lambda item, consumer=consumer: consumer.process_frame(*item),
+                maxsize=self.queue_depth,
+                name=type(consumer).__name__,
+            )
+            for consumer in consumers
+        ]
+        dispatchers = [
+            lambda frame_idx, frame, worker=worker: worker.submit((frame_idx, frame))
+            for worker in workers
+        ]
+        return dispatchers, workers
+
+    def _next_sampled(self, frame_idx, strides):
+        return min(-(-frame_idx // stride) * stride for stride in strides)
+
+    def frames(self, strides, start_frame=0, end_frame=None, on_advance=None):
+        cap = open_capture(self.video_path)
+        frame_idx = 0
+        advance = on_advance or (lambda n: None)
+
+        try:
+            while True:
+                next_idx = self._next_sampled(max(frame_idx, start_frame), strides)
+                if end_frame is not None and next_idx >= end_frame:
+                    break
+
+                gap = next_idx - frame_idx
+                if gap >= self.seek_threshold and seek(cap, next_idx):
+                    frame_idx = next_idx
+                    advance(gap)
+
+                while frame_idx < next_idx and cap.grab():
+                    frame_idx += 1
+                    advance(1)
+                if frame_idx < next_idx:
+                    break
+
+                ret, frame = cap.read()
+                if not ret:
+                    break
+
+                yield frame_idx, frame
+
+                frame_idx += 1
+                advance(1)
+        finally:
+            cap.release()
+
+    def run(self, consumers):
+        for consumer in consumers:
+            consumer.begin(self.info)
+        if not consumers:
+            return []
+
+        strides = [consumer.stride for consumer in consumers]
+        start_frame = min(getattr(consumer, "start_frame", 0) for consumer in consumers)
+        strategy = sampling_strategy(min(strides), self.seek_threshold)
+        click.echo("")
+        click.echo(
+            click.style(f"  SAMPLING: {strategy} (stride {min(strides)})", dim=True)
+        )
+
+        dispatchers, workers = self._dispatchers(consumers)
+
+        total = self.info.total_frames if self.info.total_frames > 0 else None
+        try:
+            with tqdm(
+                total=total,
+                desc="  Decoding",
+                bar_format="  {desc}: {percentage:3.0f}% |{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}]",
+                leave=False,
+            ) as pbar:
+                for frame_idx, frame in self.frames(
+                    strides, start_frame, on_advance=pbar.update
+                ):
+                    for dispatch, stride in zip(dispatchers, strides):
+                        if frame_idx % stride == 0:
+                            dispatch(frame_idx, frame)
+            for worker in workers:
+                worker.close()
+        finally:
+            # After a failure the consumers may be reused for another video,
+            # so queued frames must not reach them.
+            for worker in workers:
+                worker.abort()
+        return [consumer.finalize() for consumer in consumers]
+
+
+def open_source(video_path, decoder="opencv", **kwargs):
+    """Frame source for ``video_path`` decoding with ``decoder``."""
+    if decoder == "ffmpeg":
+        from src.utils.ffmpeg_source import FfmpegFrameSource
+
+        return FfmpegFrameSource(video_path, **kwargs)
+    return FrameSource(video_path, **kwargs)
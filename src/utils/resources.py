@@ -0,0 +1,30 @@
+import cv2
+from multiprocessing import cpu_count
+
+FIXED_CORES = {"shot_cuts": 1, "motion": 1}
+CORE_SHARES = {"text": 3, "object_dominance": 1}
+
+
+def allocate_cores(
+    total=None, features=("shot_cuts", "motion", "text", "object_dominance")
+):
+    """Split a core budget between extractors running side by side.
+
+    Shot detection and motion are single-threaded OpenCV loops and get one
+    core each; the remainder is shared between the OCR pool and torch.
+    """
+    total = max(1, int(total or cpu_count()))
+    allocation = {name: FIXED_CORES[name] for name in features if name in FIXED_CORES}
+
+    shared = [name for name in features if name in CORE_SHARES]
+    if shared:
+        remaining = max(len(shared), total - sum(allocation.values()))
+        weights = sum(CORE_SHARES[name] for name in shared)
+        for name in shared:
+            allocation[name] = max(1, remaining * CORE_SHARES[name] // weights)
+
+    return allocation
+
+
+def set_opencv_threads(allocation):
+    cv2.setNumThreads(max(1, sum(allocation.get(name, 0) for name in FIXED_CORES)))
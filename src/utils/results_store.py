@@ -0,0 +1,207 @@
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+
+DB_NAME = "results.db"
+
+# (column, type, feature, key) for the feature values stored as columns.
+COLUMNS = (
+    ("duration", "REAL", "shot_cuts", "duration"),
+    ("total_cuts", "INTEGER", "shot_cuts", "total_cuts"),
+    ("avg_scene_length", "REAL", "shot_cuts", "avg_scene_length"),
+    ("scene_count", "INTEGER", "shot_cuts", "scene_count"),
+    ("average_motion", "REAL", "motion", "average_motion"),
+    ("p90_motion", "REAL", "motion", "p90_motion"),
+    ("max_motion", "REAL", "motion", "max_motion"),
+    ("motion_intensity", "TEXT", "motion", "motion_intensity"),
+    ("text_present_ratio", "REAL", "text", "text_present_ratio"),
+    ("text_frames", "INTEGER", "text", "text_frames"),
+    ("person_object_ratio", "REAL", "object_dominance", "person_object_ratio"),
+    ("total_persons", "INTEGER", "object_dominance", "total_persons"),
+    ("total_objects", "INTEGER", "object_dominance", "total_objects"),
+)
+INDEXED = (
+    "name",
+    "total_cuts",
+    "p90_motion",
+    "motion_intensity",
+    "text_present_ratio",
+    "person_object_ratio",
+    "total_persons",
+)
+QUERY_COLUMNS = ("path", "name") + tuple(column for column, *_ in COLUMNS)
+NUMERIC_COLUMNS = {column for column, kind, *_ in COLUMNS if kind != "TEXT"}
+OPERATORS = ("<=", ">=", "!=", "=", "<", ">")
+
+_FILTER = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(.*?)\s*$")
+
+
+def parse_filter(expression):
+    """``"text_present_ratio>0.5"`` as ``("text_present_ratio", ">", 0.5)``."""
+    match = _FILTER.match(expression)
+    if not match or match.group(1) not in QUERY_COLUMNS:
+        raise ValueError(
+            f"Invalid filter {expression!r}, expected COLUMN{{{','.join(OPERATORS)}}}VALUE "
+            f"with COLUMN one of {', '.join(QUERY_COLUMNS)}"
+        )
+    column, operator, value = match.groups()
+    if column in NUMERIC_COLUMNS:
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"{column} needs a number, got {value!r}") from None
+    return column, operator, value
+
+
+class ResultsStore:
+    """Per-video features in SQLite, one row per analyzed video path.
+
+    The scalar features are indexed columns, cut timestamps and keywords go
+    to their own tables, and the full ``features`` document is kept as JSON
+    so ``output.json`` can be reproduced. Rerunning a video with a subset of
+    the features only replaces those features.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._create()
+
+    def _create(self):
+        columns = "".join(f"    {column} {kind},\n" for column, kind, *_ in COLUMNS)
+        indexes = "".join(
+            f"CREATE INDEX IF NOT EXISTS videos_{column} ON videos({column});\n"
+            for column in INDEXED
+        )
+        self._conn.executescript(
+            f"""
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    analyzed_at REAL NOT NULL,
+{columns}    features TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cuts (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keywords (
+    video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    word TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    frames INTEGER,
+    first_seen REAL,
+    last_seen REAL
+);
+CREATE INDEX IF NOT EXISTS cuts_video ON cuts(video_id);
+CREATE INDEX IF NOT EXISTS keywords_video ON keywords(video_id);
+CREATE INDEX IF NOT EXISTS keywords_word ON keywords(word);
+{indexes}"""
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def add(self, output_data):
+        self.add_many([output_data])
+
+    def add_many(self, outputs):
+        """Insert or update the videos in ``outputs`` in one transaction."""
+        with self._conn:
+            for output_data in outputs:
+                self._insert(output_data)
+
+    def _insert(self, output_data):
+        path = str(Path(output_data["video_file"]).resolve())
+        features = dict(output_data["features"])
+        row = self._conn.execute(
+            "SELECT features FROM videos WHERE path = ?", (path,)
+        ).fetchone()
+        if row is not None:
+            features = {**json.loads(row[0]), **features}
+
+        values = {
+            "path": path,
+            "name": Path(path).stem,
+            "analyzed_at": time.time(),
+            "features": json.dumps(features),
+        }
+        for column, _, feature, key in COLUMNS:
+            values[column] = (features.get(feature) or {}).get(key)
+
+        names = ", ".join(values)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in values)
+        (video_id,) = self._conn.execute(
+            f"INSERT INTO videos ({names}) VALUES ({', '.join('?' * len(values))}) "
+            f"ON CONFLICT(path) DO UPDATE SET {updates} RETURNING id",
+            list(values.values()),
+        ).fetchone()
+
+        self._conn.execute("DELETE FROM cuts WHERE video_id = ?", (video_id,))
+        self._conn.execute("DELETE FROM keywords WHERE video_id = ?", (video_id,))
+        shot_cuts = features.get("shot_cuts") or {}
+        self._conn.executemany(
+            "INSERT INTO cuts VALUES (?, ?)",
+            [(video_id, cut) for cut in shot_cuts.get("cut_timestamps", [])],
+        )
+        text = features.get("text") or {}
+        self._conn.executemany(
+            "INSERT INTO keywords VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    video_id,
+                    keyword["word"],
+                    keyword["count"],
+                    keyword.get("frames"),
+                    keyword.get("first_seen"),
+                    keyword.get("last_seen"),
+                )
+                for keyword in text.get("top_keywords", [])
+            ],
+        )
+
+    def query(self, filters=(), keywords=(), order_by="name", limit=None):
+        """Rows of the videos matching every filter and keyword, as dicts.
+
+        ``filters`` are ``(column, operator, value)`` triples from
+        ``parse_filter``. ``order_by`` is a column, prefixed with ``-`` for
+        descending order.
+        """
+        clauses, params = [], []
+        for column, operator, value in filters:
+            if column not in QUERY_COLUMNS or operator not in OPERATORS:
+                raise ValueError(f"Invalid filter {column}{operator}{value}")
+            clauses.append(f"{column} {operator} ?")
+            params.append(value)
+        for keyword in keywords:
+            clauses.append("id IN (SELECT video_id FROM keywords WHERE word = ?)")
+            params.append(keyword)
+
+        descending = order_by.startswith("-")
+        order_by = order_by.lstrip("-")
+        if order_by not in QUERY_COLUMNS:
+            raise ValueError(f"Cannot order by {order_by!r}")
+
+        sql = f"SELECT {', '.join(QUERY_COLUMNS)}, features FROM videos"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order_by} {'DESC' if descending else 'ASC'}, path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        cursor = self._conn.execute(sql, params)
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+
+def to_output(row):
+    """The ``output.json`` document for a row returned by ``query``."""
+    return {"video_file": row["path"], "features": json.loads(row["features"])}
@@ -0,0 +1,48 @@
+SEEK_THRESHOLD = 90
+
+
+def parse_sample_rate(sample_rate):
+    if isinstance(sample_rate, str):
+        spec = sample_rate.strip().lower()
+        if spec.endswith("fps"):
+            per_second = float(spec[:-3])
+            if per_second <= 0:
+                raise ValueError(f"Invalid sample rate: {sample_rate}")
+            return "fps", per_second
+        sample_rate = spec
+
+    try:
+        stride = int(sample_rate)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid sample rate: {sample_rate}") from None
+    return "frames", max(1, stride)
+
+
+def resolve_stride(sample_rate, fps):
+    unit, value = parse_sample_rate(sample_rate)
+    if unit == "fps":
+        return max(1, round(fps / value)) if fps > 0 else 1
+    return value
+
+
+def sampling_strategy(stride, seek_threshold=SEEK_THRESHOLD):
+    if stride <= 1:
+        return "read"
+    if stride < seek_threshold:
+        return "grab"
+    return "seek"
+
+
+def chunk_bounds(total_frames, stride, chunks):
+    """Split the samples of a video into ``chunks`` ``(start, end)`` sample ranges.
+
+    The last range is open-ended (``end`` is None) so frames beyond a short
+    frame count still get scanned.
+    """
+    total_samples = -(-total_frames // stride)
+    chunks = min(chunks, max(1, total_samples))
+    edges = [total_samples * i // chunks for i in range(chunks)]
+    return [
+        (start, edges[i + 1] if i + 1 < chunks else None)
+        for i, start in enumerate(edges)
+    ]
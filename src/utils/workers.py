@@ -0,0 +1,70 @@
+import queue
+import threading
+
+_STOP = object()
+
+
+class BackgroundWorker:
+    """Runs ``handler`` on items from a bounded queue in a background thread.
+
+    ``submit`` blocks once ``maxsize`` items are waiting, which keeps the
+    producer at most that many items ahead of the handler.
+    """
+
+    def __init__(self, handler, maxsize=4, name=None):
+        self._handler = handler
+        self._queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self._error = None
+        self._aborted = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            try:
+                if self._error is None and not self._aborted:
+                    self._handler(item)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    def submit(self, item):
+        self._raise_if_failed()
+        self._queue.put(item)
+
+    def join(self):
+        """Wait until every submitted item has been handled."""
+        self._queue.join()
+        self._raise_if_failed()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_if_failed()
+
+    def abort(self):
+        """Drop the waiting items and stop once the current one is handled.
+
+        Errors from the handler are not raised; this is for cleaning up
+        after a failure elsewhere.
+        """
+        if not self._thread.is_alive():
+            return
+        self._aborted = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._queue.task_done()
+        self._queue.put(_STOP)
+        self._thread.join()
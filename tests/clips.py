@@ -0,0 +1,38 @@
+import cv2
+import numpy as np
+
+FPS = 24.0
+# Hard cuts at 30, 60, 66 and 100, plus a one-frame flash at 125. The cut at
+# 66 falls inside min_scene_len of the one at 60. Each scene pans diagonally
+# by one pixel per frame.
+SCENE_STARTS = [0, 30, 60, 66, 100]
+FLASH = 125
+FRAMES = 150
+SCENE_COLORS = [
+    (40, 60, 200),
+    (200, 80, 30),
+    (60, 190, 70),
+    (30, 30, 40),
+    (180, 200, 220),
+]
+
+
+def write_clip(path, flash=True):
+    rng = np.random.default_rng(0)
+    textures = [
+        cv2.GaussianBlur(rng.normal(0, 40, (280, 360, 3)), (0, 0), 3) + color
+        for color in SCENE_COLORS
+    ]
+    writer = cv2.VideoWriter(
+        str(path), cv2.VideoWriter_fourcc(*"MJPG"), FPS, (320, 240)
+    )
+    for frame_idx in range(FRAMES):
+        scene = np.searchsorted(SCENE_STARTS, frame_idx, side="right") - 1
+        offset = (frame_idx - SCENE_STARTS[scene]) % 40
+        frame = textures[scene][offset : offset + 240, offset : offset + 320]
+        frame = np.clip(frame, 0, 255).astype(np.uint8)
+        writer.write(
+            np.full_like(frame, 255) if flash and frame_idx == FLASH else frame
+        )
+    writer.release()
+    return str(path)
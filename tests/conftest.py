@@ -0,0 +1,14 @@
+import pytest
+
+from tests.clips import write_clip
+
+
+@pytest.fixture(scope="session")
+def clip(tmp_path_factory):
+    return write_clip(tmp_path_factory.mktemp("clips") / "cuts.avi")
+
+
+@pytest.fixture(scope="session")
+def cut_clip(tmp_path_factory):
+    # A skipped scan cannot see a flash that falls between two samples.
+    return write_clip(tmp_path_factory.mktemp("clips") / "hard_cuts.avi", flash=False)
@@ -0,0 +1,50 @@
+import shutil
+
+import src.cli
+from src.cli import analyze_video
+from src.extractors.shot_cut_detector import ShotCutDetector
+from src.utils.cache import ResultCache, fingerprint_video
+
+
+def _analyze(monkeypatch, video, extractor, cache):
+    runs = []
+    run_extractors = src.cli.run_extractors
+
+    def counting(video_path, extractors, *args):
+        runs.extend(e.feature_name for e in extractors)
+        return run_extractors(video_path, extractors, *args)
+
+    monkeypatch.setattr(src.cli, "run_extractors", counting)
+    return analyze_video(video, [extractor], cache), runs
+
+
+def test_unchanged_inputs_hit_and_changes_miss(monkeypatch, tmp_path, clip):
+    video = shutil.copy(clip, tmp_path / "clip.avi")
+    cache = ResultCache(tmp_path / "cache")
+
+    first, runs = _analyze(monkeypatch, video, ShotCutDetector(), cache)
+    assert runs == ["shot_cuts"]
+    again, runs = _analyze(monkeypatch, video, ShotCutDetector(), cache)
+    assert runs == []
+    assert again == first
+
+    _, runs = _analyze(monkeypatch, video, ShotCutDetector(threshold=40.0), cache)
+    assert runs == ["shot_cuts"]
+
+    fingerprint = fingerprint_video(video)
+    with open(video, "ab") as f:
+        f.write(b"\0" * 16)
+    assert fingerprint_video(video) != fingerprint
+    _, runs = _analyze(monkeypatch, video, ShotCutDetector(), cache)
+    assert runs == ["shot_cuts"]
+
+
+def test_unreadable_entries_miss(tmp_path):
+    cache = ResultCache(tmp_path)
+    params = {"threshold": 27.0}
+    cache.put("abc", "shot_cuts", params, {"total_cuts": 2})
+    assert cache.get("abc", "shot_cuts", params) == {"total_cuts": 2}
+    assert cache.get("abc", "shot_cuts", {"threshold": 30.0}) is None
+
+    cache.path("abc", "shot_cuts", params).write_text("{")
+    assert cache.get("abc", "shot_cuts", params) is None
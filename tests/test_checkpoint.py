@@ -0,0 +1,63 @@
+from itertools import count
+
+import numpy as np
+import pytest
+
+from src.extractors.motion_analyzer import MotionAnalyzer
+from src.extractors.shot_cut_detector import ShotCutDetector
+from src.utils.checkpoint import Checkpoint, CheckpointStore
+from src.utils.frame_source import FrameSource
+
+
+class Interrupted(Exception):
+    pass
+
+
+class InterruptAt:
+    """Consumer that fails the run when it reaches ``frame``."""
+
+    stride = 1
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def begin(self, info):
+        pass
+
+    def process_frame(self, frame_idx, frame):
+        if frame_idx >= self.frame:
+            raise Interrupted
+
+    def finalize(self):
+        return None
+
+
+def _extractors():
+    return [MotionAnalyzer(sample_rate=2), ShotCutDetector()]
+
+
+@pytest.mark.parametrize("every", [1, 7])
+@pytest.mark.parametrize("interrupt_at", [45, 101, 149])
+def test_resumed_run_matches_uninterrupted(
+    monkeypatch, tmp_path, clip, every, interrupt_at
+):
+    calls = count(1)
+    monkeypatch.setattr(Checkpoint, "due", lambda self: next(calls) % every == 0)
+    store = CheckpointStore(tmp_path, interval=0)
+
+    expected_extractors = _extractors()
+    expected = FrameSource(clip).run(expected_extractors)
+
+    interrupted = [store.attach("video", e) for e in _extractors()]
+    with pytest.raises(Interrupted):
+        FrameSource(clip).run(interrupted + [InterruptAt(interrupt_at)])
+
+    resumed_extractors = _extractors()
+    resumed = [store.attach("video", e) for e in resumed_extractors]
+    source = FrameSource(clip)
+    assert source.run(resumed) == expected
+    assert min(consumer.start_frame for consumer in resumed) > 0
+
+    motion, resumed_motion = expected_extractors[0], resumed_extractors[0]
+    for key, values in motion.pairs.items():
+        np.testing.assert_array_equal(resumed_motion.pairs[key], values, err_msg=key)
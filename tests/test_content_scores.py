@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from src.extractors.content_scores import ContentScorer, FlashFilter, filter_cuts
+from src.extractors.shot_cut_detector import ShotCutDetector
+from tests.clips import FPS
+
+scenedetect = pytest.importorskip("scenedetect")
+
+
+def _frames_above(above, total=120):
+    frames = np.arange(total)
+    return frames, np.isin(frames, above) * 30.0
+
+
+@pytest.mark.parametrize(
+    ("above", "mode", "expected"),
+    [
+        ([20, 30, 45, 47, 80], "merge", [20, 47, 80]),
+        ([20, 30, 45, 47, 80], "suppress", [20, 45, 80]),
+        ([20, 25, 28, 50, 55], "merge", [20, 55]),
+        ([20, 25, 28, 50, 55], "suppress", [20, 50]),
+        ([20, 25, 28], "merge", [20]),
+        ([5, 20], "merge", [20]),
+        ([5, 20], "suppress", [20]),
+    ],
+)
+def test_filter_cuts_edge_cases(above, mode, expected):
+    frames, scores = _frames_above(above)
+    assert filter_cuts(frames, scores, 27.0, 15, mode) == expected
+
+
+def test_filter_cuts_without_min_scene_len_keeps_every_cut():
+    frames, scores = _frames_above([3, 4, 5, 90])
+    assert filter_cuts(frames, scores, 27.0, 0) == [3, 4, 5, 90]
+    assert filter_cuts(frames, scores, 27.0, 0, "suppress") == [3, 4, 5, 90]
+
+
+def test_filter_cuts_threshold_is_inclusive():
+    frames = np.arange(60)
+    scores = np.zeros(60)
+    scores[[20, 40]] = [27.0, 26.999]
+    assert filter_cuts(frames, scores, 27.0, 15) == [20]
+
+
+def test_flash_filter_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        FlashFilter("drop")
+
+
+@pytest.mark.parametrize("mode", ["merge", "suppress"])
+@pytest.mark.parametrize("length", [1, 5, 15])
+def test_flash_filter_matches_scenedetect(mode, length):
+    from scenedetect.scene_detector import FlashFilter as Reference
+
+    rng = np.random.default_rng(length)
+    above = (rng.random(2000) < 0.15).tolist()
+    reference = Reference(Reference.Mode[mode.upper()], length)
+    ours = FlashFilter(mode, length)
+    for frame_num, flag in enumerate(above):
+        assert ours.filter(frame_num, flag) == reference.filter(frame_num, flag)
+
+
+def test_content_scorer_scores_identical_frames_zero():
+    frame = np.random.default_rng(0).integers(0, 256, (48, 64, 3), np.uint8)
+    scorer = ContentScorer()
+    assert scorer.score(frame) == 0.0
+    assert scorer.score(frame) == 0.0
+    assert scorer.score(255 - frame) > 27.0
+
+
+def _reference_cuts(path):
+    from scenedetect import ContentDetector
+
+    scenes = scenedetect.detect(path, ContentDetector())
+    return [round(start.get_frames() / FPS, 2) for start, _ in scenes[1:]]
+
+
+def test_shot_cuts_match_scenedetect(clip):
+    expected = _reference_cuts(clip)
+    assert len(expected) == 4
+    assert ShotCutDetector().extract(clip)["cut_timestamps"] == expected
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {"frame_skip": 3},
+        {"frame_skip": 9},
+        {"workers": 2, "chunks": 5},
+        {"workers": 3, "frame_skip": 3},
+    ],
+)
+def test_skipped_and_chunked_scans_match_sequential(cut_clip, options):
+    sequential = ShotCutDetector().extract(cut_clip)
+    assert sequential["total_cuts"] == 3
+    assert ShotCutDetector(**options).extract(cut_clip) == sequential
@@ -0,0 +1,75 @@
+import json
+from collections import Counter
+
+import numpy as np
+
+from src.extractors.keywords import KeywordAggregator
+
+
+def _stream(seed=0, frames=400):
+    """Frames of word counts: a few frequent words over a long tail."""
+    rng = np.random.default_rng(seed)
+    frequent = ["alpha", "bravo", "charlie"]
+    for frame_idx in range(frames):
+        words = rng.choice(frequent, 3).tolist()
+        words += [f"rare{rng.integers(0, 5000)}" for _ in range(4)]
+        yield frame_idx, dict(Counter(words))
+
+
+def test_stop_words_and_document_frequency():
+    keywords = KeywordAggregator(stop_words={"the"}, min_document_frequency=2)
+    keywords.add(0, {"the": 5, "video": 2, "once": 4})
+    keywords.add(10, {"video": 1})
+
+    assert "the" not in keywords.words
+    assert keywords.top(fps=10.0) == [
+        {"word": "video", "count": 3, "frames": 2, "first_seen": 0.0, "last_seen": 1.0}
+    ]
+
+
+def test_unbounded_counts_are_exact():
+    keywords = KeywordAggregator(stop_words=())
+    totals = Counter()
+    for frame_idx, counts in _stream():
+        keywords.add(frame_idx, counts)
+        totals.update(counts)
+
+    assert {word: stats.count for word, stats in keywords.words.items()} == totals
+
+
+def test_space_saving_keeps_frequent_words_and_bounds_counts():
+    capacity = 50
+    keywords = KeywordAggregator(stop_words=(), capacity=capacity)
+    totals = Counter()
+    for frame_idx, counts in _stream():
+        keywords.add(frame_idx, counts)
+        totals.update(counts)
+
+    assert len(keywords.words) <= capacity
+    total = sum(totals.values())
+    for word, occurrences in totals.items():
+        if occurrences > total / capacity:
+            assert word in keywords.words
+    for word, stats in keywords.words.items():
+        assert stats.count - stats.error <= totals[word] <= stats.count
+    assert [item["word"] for item in keywords.top(3)] == [
+        word for word, _ in totals.most_common(3)
+    ]
+
+
+def test_state_round_trip_continues_identically():
+    frames = list(_stream(seed=1))
+    uninterrupted = KeywordAggregator(stop_words=(), capacity=40)
+    for frame_idx, counts in frames:
+        uninterrupted.add(frame_idx, counts)
+
+    first = KeywordAggregator(stop_words=(), capacity=40)
+    for frame_idx, counts in frames[:150]:
+        first.add(frame_idx, counts)
+    resumed = KeywordAggregator(stop_words=(), capacity=40)
+    resumed.load_state(json.loads(json.dumps(first.state())))
+    for frame_idx, counts in frames[150:]:
+        resumed.add(frame_idx, counts)
+
+    assert resumed.state() == uninterrupted.state()
+    assert resumed.top(20, fps=25.0) == uninterrupted.top(20, fps=25.0)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from src.extractors.yolo_runtime import PAD_VALUE, LetterboxBatch, letterbox_shape
+
+
+@pytest.mark.parametrize(
+    ("size", "canvas"),
+    [
+        ((1280, 720), (384, 640)),
+        ((1920, 1080), (384, 640)),
+        ((720, 1280), (640, 384)),
+        ((640, 480), (480, 640)),
+        ((1000, 1000), (640, 640)),
+        ((3840, 1600), (288, 640)),
+    ],
+)
+def test_letterbox_shape_is_stride_aligned_rectangle(size, canvas):
+    assert letterbox_shape(*size) == canvas
+
+
+def test_rectangular_batch_maps_boxes_back_to_the_frame():
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    frame[540:, :960] = 255
+    batch = LetterboxBatch(2, canvas=letterbox_shape(1920, 1080))
+    batch.add(7, frame)
+
+    image = batch.images[0]
+    assert image.shape == (384, 640, 3)
+    assert (image[:12] == PAD_VALUE).all() and (image[-12:] == PAD_VALUE).all()
+    assert (image[12 + 180 : 372, :320] == 255).all()
+
+    tensor = batch.tensor(np.empty((2, 3, 384, 640), dtype=np.float32))
+    assert tensor.shape == (1, 3, 384, 640)
+    np.testing.assert_allclose(
+        batch.to_source(0, [[0, 192, 320, 372]]), [[0, 540, 960, 1080]]
+    )
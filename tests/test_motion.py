@@ -0,0 +1,33 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.extractors.motion_analyzer import MotionAnalyzer, summarize_pairs
+from src.extractors.motion_estimators import ESTIMATORS
+
+
+@pytest.mark.parametrize("sample_rate", [1, 4])
+@pytest.mark.parametrize("estimator", sorted(ESTIMATORS))
+def test_chunked_matches_sequential(clip, estimator, sample_rate):
+    sequential = MotionAnalyzer(sample_rate, estimator=estimator)
+    chunked = MotionAnalyzer(sample_rate, estimator=estimator, workers=2, chunks=5)
+
+    assert chunked.extract(clip) == sequential.extract(clip)
+    for key, values in sequential.pairs.items():
+        np.testing.assert_array_equal(chunked.pairs[key], values, err_msg=key)
+
+
+def test_summary_rounds_float32_stats_to_two_decimals():
+    pairs = {
+        "frame": np.array([1, 2]),
+        "avg": np.array([0.91, 0.93], dtype=np.float32),
+        "p90": np.array([1.71, 1.73], dtype=np.float32),
+        "max": np.array([2.5, 3.37], dtype=np.float32),
+        "sampled_frames": np.int64(3),
+    }
+    summary = summarize_pairs(pairs)
+    assert json.dumps(summary) == (
+        '{"average_motion": 0.92, "p90_motion": 1.72, "max_motion": 3.37, '
+        '"motion_intensity": "low", "sampled_frames": 3}'
+    )
@@ -0,0 +1,23 @@
+import numpy as np
+
+from src.extractors.object_dominance import propagated_rows
+
+
+def test_propagated_rows_match_a_scan_per_frame():
+    rng = np.random.default_rng(0)
+    frame = np.sort(rng.choice(np.arange(0, 400, 4), 300))
+    sources = rng.choice(np.arange(0, 400, 4), 80)
+    targets = sources + 2
+
+    index, copies = propagated_rows(frame, targets, sources)
+
+    rows = [np.flatnonzero(frame == source) for source in sources]
+    np.testing.assert_array_equal(index, np.concatenate(rows))
+    np.testing.assert_array_equal(
+        copies, np.repeat(targets, [len(row) for row in rows])
+    )
+
+
+def test_propagated_rows_without_detections():
+    index, copies = propagated_rows(np.zeros(0, np.int32), np.array([5]), np.array([4]))
+    assert len(index) == 0 and len(copies) == 0
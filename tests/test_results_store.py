@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from src.cli import results_dir_name
+from src.query import main as query
+from src.utils.results_store import ResultsStore, parse_filter, to_output
+
+
+def _output(path, cuts, intensity="low", keywords=()):
+    return {
+        "video_file": str(path),
+        "features": {
+            "shot_cuts": {
+                "total_cuts": len(cuts),
+                "cut_timestamps": cuts,
+                "duration": 10.0,
+            },
+            "motion": {"p90_motion": 2.5, "motion_intensity": intensity},
+            "text": {
+                "text_present_ratio": 0.5,
+                "top_keywords": [
+                    {"word": word, "count": 3, "frames": 2} for word in keywords
+                ],
+            },
+        },
+    }
+
+
+@pytest.fixture
+def videos(tmp_path):
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+    return tmp_path / "a" / "clip.mp4", tmp_path / "b" / "clip.mp4"
+
+
+def test_rows_are_upserted_by_path(tmp_path, videos):
+    a, b = videos
+    store = ResultsStore(tmp_path / "results.db")
+    store.add_many([_output(a, [1.0, 2.0], keywords=["sale"]), _output(b, [3.0])])
+    store.add(_output(a, [4.0], intensity="high", keywords=["news"]))
+
+    rows = store.query()
+    assert [(row["name"], row["path"]) for row in rows] == [
+        ("clip", str(a.resolve())),
+        ("clip", str(b.resolve())),
+    ]
+    assert rows[0]["total_cuts"] == 1
+    assert to_output(rows[0])["features"]["shot_cuts"]["cut_timestamps"] == [4.0]
+
+    assert [row["path"] for row in store.query(keywords=["news"])] == [str(a.resolve())]
+    assert store.query(keywords=["sale"]) == []
+    high = store.query([parse_filter("motion_intensity=high")])
+    assert [row["path"] for row in high] == [str(a.resolve())]
+    fewer = store.query([parse_filter("total_cuts<2")], order_by="-path", limit=1)
+    assert [row["path"] for row in fewer] == [str(b.resolve())]
+    store.close()
+
+
+def test_query_cli_imports_and_filters(tmp_path, videos):
+    a, b = videos
+    for video, cuts in ((a, [1.0, 2.0]), (b, [3.0])):
+        results = tmp_path / "results" / results_dir_name(video, True)
+        results.mkdir(parents=True)
+        (results / "output.json").write_text(json.dumps(_output(video, cuts)))
+    db = str(tmp_path / "results.db")
+    runner = CliRunner()
+
+    imported = runner.invoke(
+        query, ["--db", db, "--import", str(tmp_path / "results"), "--format", "paths"]
+    )
+    assert imported.exit_code == 0, imported.output
+    assert imported.stdout.split() == [str(a.resolve()), str(b.resolve())]
+
+    table = runner.invoke(query, ["--db", db, "total_cuts>1"])
+    assert table.exit_code == 0, table.output
+    assert str(a.resolve()) in table.stdout and str(b.resolve()) not in table.stdout
+    assert "MATCHES: 1" in table.stdout
+
+    rows = runner.invoke(query, ["--db", db, "--format", "json", "total_cuts=1"])
+    assert [json.loads(line) for line in rows.stdout.splitlines()] == [
+        {**_output(b, [3.0]), "video_file": str(b.resolve())}
+    ]
+
+    bad = runner.invoke(query, ["--db", db, "colour=red"])
+    assert bad.exit_code != 0
+
+
+def test_results_dir_name_adds_a_hash_only_when_asked(videos):
+    a, b = videos
+    assert results_dir_name(a) == results_dir_name(b) == "clip"
+    assert results_dir_name(a, True) != results_dir_name(b, True)
+    assert results_dir_name(a, True).startswith("clip-")